@@ -0,0 +1,250 @@
+'''
+A compact, append-only archive of issued kingdoms.
+
+Every kingdom is one fixed 32 byte record: up to SLOTS card ids (catalog
+ids, see Deck.id) padded with EMPTY, a bitset of its special notes and the
+seed of the run that generated it.  That is the seed of the whole run, not
+of the kingdom: generating the run again with it reproduces the kingdom.
+
+Reading maps the file with numpy.memmap, so opening an archive of millions
+of kingdoms is instant and queries such as "every kingdom with Chapel and
+Witch" are vectorized scans over the mapped records.  Kingdoms come back as
+lazy, Kingdom-compatible views that only look their cards up when asked.
+
+An archive is tied to the card catalog it was written with (see
+Collection.fingerprint), since card ids mean nothing outside it.
+'''
+import os
+import struct
+
+import numpy
+
+import dominion
+
+MAGIC = 'KARC'
+VERSION = 1
+SLOTS = 10
+EMPTY = 0xffff
+
+# magic, version, catalog fingerprint
+_HEADER = struct.Struct('<4sB3x20s4x')
+
+RECORD = numpy.dtype([('cards', '<u2', (SLOTS,)), ('specials', '<u4'),
+                      ('seed', '<u8')])
+_RECORD = struct.Struct('<{0}HIQ'.format(SLOTS))
+
+# How many records a query looks at in one go
+SCAN_ROWS = 1 << 20
+
+
+def _special_notes(collection):
+    # Notes in a fixed order, bit i of a record's specials meaning notes[i]
+    return [collection.specials[key] for key in sorted(collection.specials)]
+
+
+def check_seed(seed):
+    '''
+    Raises ValueError unless *seed* fits a record's unsigned 64 bit field.
+    '''
+    if not 0 <= seed < 1 << 64:
+        raise ValueError('Only seeds from 0 to 2**64 - 1 can be archived')
+
+
+def _check_header(f, path, collection):
+    header = f.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise ValueError('{0} is not a kingdom archive'.format(path))
+
+    magic, version, fingerprint = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('{0} is not a kingdom archive'.format(path))
+    if fingerprint != collection.fingerprint:
+        raise ValueError('{0} was written with a different card '
+                         'catalog'.format(path))
+
+
+class ArchiveWriter(object):
+    '''
+    Appends kingdoms to the archive at *path*, creating it if needed.
+    '''
+    def __init__(self, path, collection):
+        self.ids = collection.index.ids
+        self.flags = dict((note, 1 << bit) for bit, note in
+                          enumerate(_special_notes(collection)))
+
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                _check_header(f, path, collection)
+
+                # A crash part way through a record leaves a partial one;
+                # drop it so the records appended next line up
+                size = os.path.getsize(path)
+                partial = (size - _HEADER.size) % _RECORD.size
+                if partial:
+                    f.truncate(size - partial)
+
+            self.file = open(path, 'ab')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(_HEADER.pack(MAGIC, VERSION,
+                                         collection.fingerprint))
+
+    def write(self, kingdom, seed=0):
+        '''
+        Appends *kingdom*, recording *seed*, the seed of the run it came
+        from.
+        '''
+        if len(kingdom.cards) > SLOTS:
+            raise ValueError('Only kingdoms of up to {0} cards can be '
+                             'archived'.format(SLOTS))
+        check_seed(seed)
+
+        cards = [self.ids[card.name] for card in kingdom.cards]
+        cards.extend([EMPTY] * (SLOTS - len(cards)))
+
+        specials = 0
+        for note in kingdom.specials:
+            specials |= self.flags[note]
+
+        self.file.write(_RECORD.pack(*cards + [specials, seed]))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ArchivedKingdom(dominion.Kingdom):
+    '''
+    A read-only Kingdom backed by one record of an Archive.
+    '''
+    def __init__(self, archive, row):
+        self.archive = archive
+        self.row = row
+
+    @property
+    def record(self):
+        return self.archive.records[self.row]
+
+    @property
+    def cards(self):
+        catalog = self.archive.catalog
+        return [catalog[card_id] for card_id in self.record['cards'].tolist()
+                if card_id != EMPTY]
+
+    @property
+    def specials(self):
+        specials = int(self.record['specials'])
+        return [note for bit, note in enumerate(self.archive.notes)
+                if specials & (1 << bit)]
+
+    @property
+    def deck_cnt(self):
+        return int((self.record['cards'] != EMPTY).sum())
+
+    @property
+    def seed(self):
+        return int(self.record['seed'])
+
+    def key(self):
+        cards = self.record['cards']
+        return numpy.sort(cards[cards != EMPTY]).astype('<u2').tostring()
+
+
+class Archive(object):
+    '''
+    The kingdoms in the archive at *path*, mapped read-only.  *records* is
+    the structured array of raw records.
+    '''
+    def __init__(self, path, collection):
+        with open(path, 'rb') as f:
+            _check_header(f, path, collection)
+
+        self.collection = collection
+        self.catalog = collection.index.cards
+        self.notes = _special_notes(collection)
+
+        rows = (os.path.getsize(path) - _HEADER.size) // RECORD.itemsize
+        if rows:
+            self.records = numpy.memmap(path, dtype=RECORD, mode='r',
+                                        offset=_HEADER.size, shape=(rows,))
+        else:
+            # An empty file can't be mapped
+            self.records = numpy.zeros(0, dtype=RECORD)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError('archive index out of range')
+
+        return ArchivedKingdom(self, row)
+
+    def __iter__(self):
+        for row in xrange(len(self)):
+            yield ArchivedKingdom(self, row)
+
+    def card_id(self, card):
+        if not isinstance(card, basestring):
+            card = card.name
+
+        try:
+            return self.collection.index.ids[card]
+        except KeyError:
+            raise ValueError('{0} is not in the card catalog'.format(card))
+
+    def containing(self, cards):
+        '''
+        The rows of every kingdom that has all of *cards* (names or Decks),
+        in order.
+        '''
+        ids = [self.card_id(card) for card in cards]
+        found = []
+
+        for start in xrange(0, len(self), SCAN_ROWS):
+            block = self.records['cards'][start:start + SCAN_ROWS]
+            match = numpy.ones(len(block), dtype=bool)
+            for card_id in ids:
+                match &= (block == card_id).any(axis=1)
+
+            found.append(numpy.flatnonzero(match) + start)
+
+        if not found:
+            return numpy.empty(0, dtype=numpy.intp)
+
+        return numpy.concatenate(found)
+
+    def select(self, rows):
+        return [ArchivedKingdom(self, row) for row in rows]
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        description='Lists the archived kingdoms that contain every given '
+        'card.')
+    parser.add_argument('archive', metavar='PATH')
+    parser.add_argument('cards', metavar='CARD', nargs='*')
+    parser.add_argument('--count', action='store_true',
+                        help='Only print how many kingdoms match.')
+
+    args = parser.parse_args()
+
+    archive = Archive(args.archive, dominion.Collection())
+    rows = archive.containing(args.cards)
+
+    if args.count:
+        print len(rows)
+    else:
+        for row in rows:
+            print 'Kingdom {0}'.format(row + 1)
+            print '==========='
+            print archive[row].pprint(group_by_set=False)
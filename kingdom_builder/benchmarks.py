@@ -0,0 +1,50 @@
+'''
+Rough timings for the kingdom builder.  Run from the repository root:
+
+    python kingdom_builder/benchmarks.py [--repeat N]
+'''
+import os
+import timeit
+
+import dominion
+
+CARD_SET = 'kingdom_builder/dominion_cards.yml'
+
+
+def startup(card_set=CARD_SET, repeat=5):
+    '''
+    Compares building a Collection from a cold YAML parse with building it
+    from the warm card cache.  Returns (cold, warm) best times in seconds.
+    '''
+    def cold():
+        cache_file = card_set + dominion.CACHE_SUFFIX
+        if os.path.exists(cache_file):
+            os.remove(cache_file)
+        dominion.Collection(card_set)
+
+    def warm():
+        dominion.Collection(card_set)
+
+    cold_time = min(timeit.repeat(cold, number=1, repeat=repeat))
+    warm()
+    warm_time = min(timeit.repeat(warm, number=1, repeat=repeat))
+
+    return cold_time, warm_time
+
+
+def main(repeat):
+    cold, warm = startup(repeat=repeat)
+    print 'Collection startup (cold parse): {0:.4f}s'.format(cold)
+    print 'Collection startup (warm cache): {0:.4f}s'.format(warm)
+    print 'Speedup: {0:.1f}x'.format(cold / warm)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Times the kingdom builder.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='How many times to repeat each measurement.')
+
+    args = parser.parse_args()
+    main(args.repeat)
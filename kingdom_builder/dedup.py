@@ -0,0 +1,143 @@
+'''
+Remembers which kingdoms have already been issued.
+
+Kingdoms are identified by Kingdom.key(), their sorted card ids packed into
+fixed-width bytes.  KeySet keeps exact keys in memory, which is plenty for a
+batch.  BloomIndex keeps a Bloom filter in a memory-mapped file, so a whole
+season of issued kingdoms fits in a few tens of MB and survives restarts.  A
+Bloom filter can wrongly claim a new kingdom was seen (at roughly
+*error_rate*) but never forgets one that was, so it never lets a kingdom
+repeat.
+'''
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+MAGIC = 'KBLM'
+VERSION = 1
+
+# magic, version, hash count, bits, keys added, catalog fingerprint
+_HEADER = struct.Struct('<4sBBQQ20s')
+_COUNT_OFFSET = 4 + 1 + 1 + 8
+
+
+class KeySet(object):
+    '''
+    An exact, in-memory set of kingdom keys.
+    '''
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, key):
+        '''
+        Records *key*, returning False if it was already there.
+        '''
+        if key in self.keys:
+            return False
+
+        self.keys.add(key)
+        return True
+
+
+def bloom_size(capacity, error_rate):
+    '''
+    The (bits, hashes) a Bloom filter needs to hold *capacity* keys with a
+    false positive rate of *error_rate*.
+    '''
+    bits = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+    hashes = max(1, int(round(float(bits) / capacity * math.log(2))))
+
+    return bits, hashes
+
+
+class BloomIndex(object):
+    '''
+    A Bloom filter of kingdom keys kept in the file at *path*.  A new file is
+    sized for *capacity* keys at *error_rate*; an existing one keeps its
+    size.  *fingerprint* (see Collection.fingerprint) ties the file to one
+    card catalog, since keys are only meaningful within it.
+    '''
+    def __init__(self, path, capacity=10 ** 7, error_rate=1e-6,
+                 fingerprint=''):
+        fingerprint = fingerprint.ljust(20, '\0')[:20]
+
+        if not os.path.exists(path):
+            bits, hashes = bloom_size(capacity, error_rate)
+            with open(path, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, VERSION, hashes, bits, 0,
+                                     fingerprint))
+                f.truncate(_HEADER.size + (bits + 7) // 8)
+
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+
+        magic, version, self.hashes, self.bits, _, stored = \
+            _HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{0} is not a kingdom index'.format(path))
+        if stored != fingerprint:
+            raise ValueError('{0} was built from a different card '
+                             'catalog'.format(path))
+
+    def __len__(self):
+        '''
+        How many distinct keys have been added.
+        '''
+        return struct.unpack_from('<Q', self.map, _COUNT_OFFSET)[0]
+
+    def _positions(self, key):
+        # Double hashing: k positions from two 64 bit halves of one digest
+        first, second = struct.unpack_from('<QQ', hashlib.sha1(key).digest())
+        bits = self.bits
+        return [_HEADER.size * 8 + (first + i * second) % bits
+                for i in xrange(self.hashes)]
+
+    def __contains__(self, key):
+        data = self.map
+        for position in self._positions(key):
+            if not ord(data[position >> 3]) & (1 << (position & 7)):
+                return False
+
+        return True
+
+    def add(self, key):
+        '''
+        Records *key*, returning False if it (probably) was already there.
+        '''
+        data = self.map
+        new = False
+
+        for position in self._positions(key):
+            offset = position >> 3
+            byte = ord(data[offset])
+            bit = 1 << (position & 7)
+            if not byte & bit:
+                data[offset] = chr(byte | bit)
+                new = True
+
+        if new:
+            struct.pack_into('<Q', data, _COUNT_OFFSET, len(self) + 1)
+
+        return new
+
+    def flush(self):
+        self.map.flush()
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
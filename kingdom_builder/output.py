@@ -0,0 +1,163 @@
+'''
+Streaming writers for generated kingdoms.
+
+Every kingdom is written as soon as it is handed over, through a buffered
+(and optionally compressed) stream, so memory use doesn't grow with the
+number of kingdoms.
+'''
+from collections import OrderedDict
+import csv
+import gzip
+import json
+import sys
+
+FORMATS = ('text', 'jsonl', 'ndjson', 'csv')
+CODECS = ('gzip', 'zstd')
+
+BUFFER_SIZE = 1 << 16
+
+
+class _Stream(object):
+    # A possibly compressed output stream.  Closing it closes every layer
+    # except stdout.
+    def __init__(self, path='-', codec=None):
+        if path == '-':
+            self.raw = sys.stdout
+        else:
+            self.raw = open(path, 'wb', BUFFER_SIZE)
+
+        if codec is None:
+            self.stream = self.raw
+        elif codec == 'gzip':
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='wb')
+        elif codec == 'zstd':
+            # Optional: only needed when zstd output is requested
+            import zstandard
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.raw)
+        else:
+            raise ValueError('{0} is not a supported codec'.format(codec))
+
+    def write(self, data):
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+
+        self.stream.write(data)
+
+    def close(self):
+        if self.stream is not self.raw:
+            self.stream.close()
+
+        if self.raw is sys.stdout:
+            self.raw.flush()
+        else:
+            self.raw.close()
+
+
+class KingdomWriter(object):
+    def __init__(self, path='-', codec=None):
+        self.stream = _Stream(path, codec)
+        self.count = 0
+
+    def write(self, kingdom):
+        self.count += 1
+        self._write(kingdom)
+
+    def _write(self, kingdom):
+        raise NotImplementedError
+
+    def close(self):
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TextWriter(KingdomWriter):
+    '''
+    The human readable listing dominion.py has always printed.
+    '''
+    def __init__(self, path='-', codec=None, sort_on='name',
+                 group_by_set=True):
+        super(TextWriter, self).__init__(path, codec)
+        self.sort_on = sort_on
+        self.group_by_set = group_by_set
+
+    def _write(self, kingdom):
+        self.stream.write(''.join([
+            'Kingdom {0}\n'.format(self.count), '===========\n',
+            kingdom.pprint(sort_on=self.sort_on,
+                           group_by_set=self.group_by_set), '\n']))
+
+    def note(self, line):
+        self.stream.write(line + '\n')
+
+
+class JSONLinesWriter(KingdomWriter):
+    '''
+    One JSON object per line:
+    {"kingdom": 1, "cards": [{"name": ..., "set": ..., "cost": ...}, ...],
+     "specials": [...]}
+    '''
+    def __init__(self, path='-', codec=None):
+        super(JSONLinesWriter, self).__init__(path, codec)
+        # Cards repeat across kingdoms, so each is only encoded once
+        self._encoded = {}
+
+    def _encode(self, card):
+        try:
+            return self._encoded[card.name]
+        except KeyError:
+            encoded = self._encoded[card.name] = json.dumps(OrderedDict([
+                ('name', card.name), ('set', card.set),
+                ('cost', getattr(card, 'cost', None))]),
+                separators=(',', ':'))
+            return encoded
+
+    def _write(self, kingdom):
+        self.stream.write(''.join([
+            '{"kingdom":', str(self.count), ',"cards":[',
+            ','.join([self._encode(card) for card in kingdom]),
+            '],"specials":', json.dumps(kingdom.specials), '}\n']))
+
+
+class CSVWriter(KingdomWriter):
+    '''
+    One row per kingdom: its number, one column per card name and the
+    special notes joined with "; ".
+    '''
+    def __init__(self, path='-', codec=None):
+        super(CSVWriter, self).__init__(path, codec)
+        self.writer = csv.writer(self.stream)
+
+    def _write(self, kingdom):
+        if self.count == 1:
+            self.writer.writerow(
+                ['kingdom'] +
+                ['card_{0}'.format(i + 1) for i in xrange(kingdom.deck_cnt)] +
+                ['notes'])
+
+        row = [self.count] + [card.name for card in kingdom]
+        row.extend([''] * (kingdom.deck_cnt + 1 - len(row)))
+        row.append('; '.join(kingdom.specials))
+
+        self.writer.writerow([
+            value.encode('utf-8') if isinstance(value, unicode) else value
+            for value in row])
+
+
+def writer(format='text', path='-', codec=None, **options):
+    '''
+    Returns the KingdomWriter for *format*, one of FORMATS.  *options* are
+    passed to the text writer.
+    '''
+    if format == 'text':
+        return TextWriter(path, codec, **options)
+    elif format in ('jsonl', 'ndjson'):
+        return JSONLinesWriter(path, codec)
+    elif format == 'csv':
+        return CSVWriter(path, codec)
+
+    raise ValueError('{0} is not a supported format'.format(format))
@@ -0,0 +1,238 @@
+'''
+Filter and aggregate questions over the card catalog and archived kingdoms.
+
+Card attributes are laid out once as NumPy columns (cost, a type bitmask and
+a set id per catalog id), so a question is a few array operations instead
+of a loop over Decks.  Each column also has a 64K entry lookup table, so the
+raw card ids of archived kingdoms (see archive.py) translate to costs or
+types with a single fancy index, padding included.
+'''
+import re
+
+import numpy
+
+import archive
+import sampling
+
+NO_COST = -1
+
+# A type bit no card has, standing in for types the catalog doesn't know
+_UNKNOWN_TYPE = 1 << 31
+
+_LEADING_DIGITS = re.compile(r'\d+')
+
+
+def _cost(card):
+    # Costs are strings in the catalog; anything without a number (or no
+    # cost at all) is NO_COST
+    match = _LEADING_DIGITS.match(str(getattr(card, 'cost', '')))
+    return int(match.group()) if match else NO_COST
+
+
+def _lookup(column, fill):
+    # Indexed by raw archived card id, archive.EMPTY included
+    table = numpy.full(archive.EMPTY + 1, fill, dtype=column.dtype)
+    table[:len(column)] = column
+    return table
+
+
+class CardTable(object):
+    '''
+    Columns over every card *collection* has ever indexed, in id order:
+    *cost*, *types* (bit i set for type_names[i]), *set_id* (an index into
+    set_names) and *available* (whether the card is currently in the
+    collection).
+    '''
+    def __init__(self, collection):
+        index = collection.index
+        self.catalog = index.cards
+        self.ids = index.ids
+        self.type_names = sorted(index.type_masks)
+        self.set_names = sorted(index.set_masks)
+
+        # The index already has every type and set as a bitset over ids
+        width = len(self.catalog)
+        types = sampling.mask_matrix(
+            [index.type_masks[name] for name in self.type_names], width)
+        sets = sampling.mask_matrix(
+            [index.set_masks[name] for name in self.set_names], width)
+
+        self.cost = numpy.array([_cost(card) for card in self.catalog],
+                                dtype=numpy.int16)
+        self.types = numpy.zeros(width, dtype=numpy.uint32)
+        for bit, members in enumerate(types):
+            self.types[members] |= 1 << bit
+        self.set_id = numpy.full(width, -1, dtype=numpy.int16)
+        for set_id, members in enumerate(sets):
+            self.set_id[members] = set_id
+        self.available = sampling.mask_matrix(
+            [collection.available], len(self.catalog))[0]
+
+        self.cost_of = _lookup(self.cost, NO_COST)
+        self.types_of = _lookup(self.types, 0)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def type_bits(self, types):
+        '''
+        The bitmask of *types*; unknown types match nothing.
+        '''
+        if isinstance(types, basestring):
+            types = [types]
+
+        bits = 0
+        for card_type in types:
+            try:
+                bits |= 1 << self.type_names.index(card_type.lower())
+            except ValueError:
+                bits |= _UNKNOWN_TYPE
+        return bits
+
+    def card_id(self, card):
+        if not isinstance(card, basestring):
+            card = card.name
+
+        try:
+            return self.ids[card]
+        except KeyError:
+            raise ValueError('{0} is not in the card catalog'.format(card))
+
+    def where(self, cost=None, types=(), any_types=(), exclude_types=(),
+              sets=None, available=False):
+        '''
+        A boolean mask over card ids.  *cost* is a (min, max) range, either
+        end None for no limit; cards must have every one of *types*, at
+        least one of *any_types* (when given) and none of *exclude_types*.
+        *sets* limits the cards to those sets and *available* to the cards
+        currently in the collection.
+        '''
+        match = numpy.ones(len(self), dtype=bool)
+
+        if cost is not None:
+            low, high = cost
+            if low is not None:
+                match &= self.cost >= low
+            if high is not None:
+                match &= (self.cost <= high) & (self.cost != NO_COST)
+
+        if types:
+            bits = self.type_bits(types)
+            match &= (self.types & bits) == bits
+        if any_types:
+            match &= (self.types & self.type_bits(any_types)) != 0
+        if exclude_types:
+            match &= (self.types & self.type_bits(exclude_types)) == 0
+
+        if sets is not None:
+            if isinstance(sets, basestring):
+                sets = [sets]
+            wanted = [self.set_names.index(name.lower()) for name in sets
+                      if name.lower() in self.set_names]
+            match &= numpy.in1d(self.set_id, wanted)
+
+        if available:
+            match &= self.available
+
+        return match
+
+    def cards(self, **filters):
+        '''
+        The Decks matching *filters* (see where), in id order.
+        '''
+        return [self.catalog[card_id]
+                for card_id in numpy.flatnonzero(self.where(**filters))]
+
+
+class KingdomQuery(object):
+    '''
+    Questions about the kingdoms in an archive.Archive.  Every method takes
+    an optional array of *rows* to restrict it to (for instance the result
+    of rows()), and scans the mapped records archive.SCAN_ROWS at a time.
+    '''
+    def __init__(self, kingdoms, table=None):
+        self.kingdoms = kingdoms
+        self.table = table or CardTable(kingdoms.collection)
+
+    def _blocks(self, rows=None):
+        # (rows, card ids) for each block of records
+        cards = self.kingdoms.records['cards']
+        step = archive.SCAN_ROWS
+
+        if rows is None:
+            for start in xrange(0, len(cards), step):
+                yield numpy.arange(start, min(start + step, len(cards))), \
+                    cards[start:start + step]
+        else:
+            rows = numpy.asarray(rows, dtype=numpy.intp)
+            for start in xrange(0, len(rows), step):
+                block = rows[start:start + step]
+                yield block, cards[block]
+
+    def rows(self, include=(), exclude=(), rows=None):
+        '''
+        The rows of the kingdoms with every card in *include* and none of
+        those in *exclude*.
+        '''
+        include = [self.table.card_id(card) for card in include]
+        exclude = [self.table.card_id(card) for card in exclude]
+        found = [numpy.empty(0, dtype=numpy.intp)]
+
+        for block_rows, cards in self._blocks(rows):
+            match = numpy.ones(len(cards), dtype=bool)
+            for card_id in include:
+                match &= (cards == card_id).any(axis=1)
+            for card_id in exclude:
+                match &= (cards != card_id).all(axis=1)
+
+            found.append(block_rows[match])
+
+        return numpy.concatenate(found)
+
+    def cost_curve(self, rows=None):
+        '''
+        A (kingdoms, costs) array: how many cards of each cost, from 0 up
+        to the highest cost in the catalog, every kingdom has.  Cards
+        without a cost aren't counted.
+        '''
+        width = max(self.table.cost.max() + 1 if len(self.table) else 0, 1)
+        curves = [numpy.zeros((0, width), dtype=numpy.intp)]
+
+        # Uncosted cards and padding go in an extra column that is dropped
+        bins = self.table.cost_of.astype(numpy.intp)
+        bins[bins == NO_COST] = width
+        cells = width + 1
+
+        for _, cards in self._blocks(rows):
+            # One bincount over (kingdom, cost) cells
+            flat = bins[cards] + numpy.arange(len(cards))[:, None] * cells
+            curves.append(numpy.bincount(
+                flat.ravel(), minlength=len(cards) * cells).reshape(
+                    -1, cells)[:, :width])
+
+        return numpy.concatenate(curves)
+
+    def type_counts(self, types, rows=None):
+        '''
+        How many cards with every one of *types* each kingdom has.
+        '''
+        bits = self.table.type_bits(types)
+        counts = [numpy.empty(0, dtype=numpy.intp)]
+
+        for _, cards in self._blocks(rows):
+            counts.append(
+                ((self.table.types_of[cards] & bits) == bits).sum(axis=1))
+
+        return numpy.concatenate(counts)
+
+    def card_counts(self, rows=None):
+        '''
+        How many of the kingdoms each card (by id) appears in.
+        '''
+        counts = numpy.zeros(archive.EMPTY + 1, dtype=numpy.intp)
+
+        for _, cards in self._blocks(rows):
+            counts += numpy.bincount(cards.ravel(),
+                                     minlength=archive.EMPTY + 1)
+
+        return counts[:len(self.table)]
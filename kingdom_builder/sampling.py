@@ -0,0 +1,93 @@
+'''
+NumPy helpers for drawing many kingdoms at once.
+
+Card pools are rows of a boolean matrix indexed by card id (see
+dominion.CardIndex).  Sampling without replacement uses the argsort trick:
+give every available card a uniform random key and keep the k largest keys
+of each row.
+'''
+import string
+
+import numpy
+
+_BIT_BYTES = string.maketrans('01', '\x00\x01')
+
+
+def random_state(rng=None):
+    '''
+    Coerces *rng* into a NumPy random generator.  *rng* may be None (fresh
+    entropy), an integer seed or an existing RandomState/Generator.
+    '''
+    if rng is None or isinstance(rng, (int, long)):
+        return numpy.random.RandomState(rng)
+
+    return rng
+
+
+def uniform(rng, size=None):
+    try:
+        return rng.random_sample(size)
+    except AttributeError:
+        # numpy.random.Generator
+        return rng.random(size)
+
+
+def seed_from(rng):
+    '''
+    Derives an integer seed from *rng*, used to seed the pure-Python parts of
+    a draw so a whole batch is reproducible from one generator.
+    '''
+    return int(uniform(rng) * 2 ** 52)
+
+
+def mask_matrix(masks, width):
+    '''
+    Converts a list of integer card bitsets into a (len(masks), width)
+    boolean matrix.
+    '''
+    bits = ''.join(bin(mask)[:1:-1].translate(_BIT_BYTES).ljust(width, '\x00')
+                   for mask in masks)
+
+    return numpy.frombuffer(bits, dtype=bool).reshape(len(masks), width)
+
+
+def sample_rows(available, counts, rng, weights=None):
+    '''
+    For each row of the boolean matrix *available*, draws counts[row] column
+    ids without replacement, by the column *weights* if given.  Returns a
+    list of id arrays.
+
+    Raises ValueError if a row doesn't have enough available columns.
+    '''
+    counts = numpy.asarray(counts, dtype=numpy.intp)
+
+    if weights is not None:
+        weights = numpy.asarray(weights, dtype=float)
+        available = available & (weights > 0)
+
+    if (available.sum(axis=1) < counts).any():
+        raise ValueError('Not enough cards with your given parameters')
+
+    k = counts.max() if len(counts) else 0
+    if k == 0:
+        return [numpy.empty(0, dtype=numpy.intp) for _ in counts]
+
+    # Unavailable cards get a key below every uniform draw so they sort last
+    keys = uniform(rng, available.shape)
+    if weights is not None:
+        # Ranking by u ** (1 / weight) is the same as drawing by weight
+        # one card at a time (Efraimidis and Spirakis)
+        with numpy.errstate(divide='ignore'):
+            keys **= 1.0 / weights
+    keys[~available] = -1.0
+
+    rows = numpy.arange(len(keys))[:, None]
+    top = numpy.argpartition(-keys, k - 1, axis=1)[:, :k]
+
+    # argpartition leaves the top k unordered, and rows that need fewer than
+    # k cards must keep their largest keys, so order the winners by key.
+    # When every row needs k cards the order doesn't matter.
+    if (counts != k).any():
+        top = top[rows, numpy.argsort(-keys[rows, top], axis=1)]
+
+    return [row[:count] for row, count in zip(top, counts)]
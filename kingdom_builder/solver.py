@@ -0,0 +1,336 @@
+'''
+Exact constraint solving for kingdoms.
+
+A kingdom request is a pool of cards (a CardIndex bitset), a deck size, some
+forced cards and any number of count constraints: "between *min* and *max*
+of the chosen cards must be in *mask*".  Type, set and cost constraints are
+all just masks.
+
+Cards that fall in exactly the same constraint masks are interchangeable,
+so the solver groups them into classes and counts kingdoms with dynamic
+programming over (class, cards picked, per-constraint counts).  The counts
+are exact, which makes feasibility a lookup and lets us sample uniformly
+from all feasible kingdoms.
+
+The DP runs one class at a time over every reachable state at once, with
+the states packed into int64 keys for NumPy.  How many states there are is
+what decides the cost, so:
+
+* a constraint drops out of the state ("settles") as soon as the cards
+  left can no longer break it;
+* a constraint over most of the pool is tracked through its complement,
+  since every kingdom picks the same number of cards;
+* classes are visited in the order that keeps the fewest constraints open
+  at once.
+
+Even so the state space grows exponentially with the number of overlapping
+constraints, so a solver gives up with TooManyStates past *max_states*.
+'''
+from collections import defaultdict
+
+import numpy
+
+# How many DP states a solver may visit before giving up
+MAX_STATES = 10 ** 6
+
+
+class TooManyStates(Exception):
+    pass
+
+
+def _binomials(n):
+    # Row n of Pascal's triangle
+    row = [1]
+    for k in xrange(n):
+        row.append(row[-1] * (n - k) // (k + 1))
+
+    return row
+
+
+def _limits(low, high, supply, slots):
+    # (low, high) on how many of *supply* cards are picked, with high None
+    # when it can't bind.  None if the limits can never be met.
+    reach = min(supply, slots)
+    if low > reach or (high is not None and high < low):
+        return None
+    if high is not None and high >= reach:
+        high = None
+
+    return low, high
+
+
+class KingdomSolver(object):
+    def __init__(self, index, pool, deck_size, constraints=(), pinned=(),
+                 max_states=MAX_STATES):
+        '''
+        *pool* is the bitset of cards the kingdom may be drawn from, *pinned*
+        the cards every kingdom must contain, and *constraints* a list of
+        (mask, (min, max)) pairs where a max of None is unlimited.
+        '''
+        self.index = index
+        self.deck_size = deck_size
+        self.pinned = list(pinned)
+        self.max_states = max_states
+
+        pinned_mask = index.mask(self.pinned)
+        pool &= ~pinned_mask
+        self.slots = slots = deck_size - len(self.pinned)
+        self.infeasible = slots < 0 or index.count(pool) < slots
+
+        # Limits on the cards still to pick, net of the pinned ones
+        masks, lows, highs = [], [], []
+        for mask, (low, high) in constraints:
+            held = index.count(mask & pinned_mask)
+            mask &= pool
+            limits = _limits(max(low - held, 0),
+                             None if high is None else high - held,
+                             index.count(mask), slots)
+
+            if limits is None:
+                self.infeasible = True
+                continue
+
+            low, high = limits
+            rest = pool & ~mask
+            if index.count(mask) > index.count(rest):
+                # Fewer classes touch the complement, so it settles sooner
+                mask = rest
+                low, high = (0 if high is None else slots - high,
+                             slots - low)
+                limits = _limits(low, high, index.count(mask), slots)
+                if limits is None:
+                    self.infeasible = True
+                    continue
+                low, high = limits
+
+            if low or high is not None:
+                masks.append(mask)
+                lows.append(low)
+                highs.append(high)
+
+        self.masks = masks
+        self._classes(masks, lows, highs, pool)
+
+        # Every constraint is a digit of a state's key: its count so far,
+        # or SETTLED once the remaining cards can't break it
+        self.lows = numpy.array(lows, dtype=numpy.int64)
+        self.bounded = numpy.array([high is not None for high in highs],
+                                   dtype=bool)
+        self.highs = numpy.array([slots if high is None else high
+                                  for high in highs], dtype=numpy.int64)
+        self.settled = numpy.where(self.bounded, self.highs + 1, self.lows)
+
+        radix = self.settled + 1
+        self.picked_multiplier = reduce(lambda a, b: a * b, radix.tolist(), 1)
+        if self.picked_multiplier * (max(slots, 0) + 1) >= 2 ** 62:
+            raise TooManyStates('Too many constraints to count exactly')
+        self.multipliers = numpy.cumprod(
+            numpy.concatenate([[1], radix]))[:-1].astype(numpy.int64)
+        self.radix = radix
+
+        # A whole kingdom is never more than C(pool, slots) ways, so int64
+        # is exact unless the pool is huge
+        largest = max(_binomials(index.count(pool))[:max(slots, 0) + 1] or
+                      [1])
+        self.dtype = numpy.int64 if largest < 2 ** 62 else object
+
+        self._tables = None
+
+    def _classes(self, masks, lows, highs, pool):
+        index = self.index
+
+        classes = defaultdict(list)
+        for card in index.cards_in(pool):
+            bit = index.bit(card)
+            signature = tuple(1 if mask & bit else 0 for mask in masks)
+            classes[signature].append(card)
+
+        # Greedily take the class that leaves the fewest (weighted by their
+        # range) constraints open, so states settle as early as possible
+        sizes = [(high if high is not None else low) + 2
+                 for low, high in zip(lows, highs)]
+        todo = sorted(classes.items(), key=lambda item: (len(item[1]),
+                                                         item[0]))
+        left = [sum(signature[j] for signature, _ in todo)
+                for j in xrange(len(masks))]
+        started = [0] * len(masks)
+        ordered = []
+
+        while todo:
+            def cost(item):
+                signature, cards = item
+                weight = 1
+                for j, size in enumerate(sizes):
+                    if ((started[j] or signature[j]) and
+                            left[j] - signature[j]):
+                        weight *= size
+                return weight, len(cards)
+
+            item = min(todo, key=cost)
+            todo.remove(item)
+            ordered.append(item)
+            for j, flag in enumerate(item[0]):
+                if flag:
+                    started[j] = 1
+                    left[j] -= 1
+
+        self.classes = ordered
+        self.binomials = [_binomials(len(cards)) for _, cards in ordered]
+        self.signatures = numpy.array(
+            [signature for signature, _ in ordered],
+            dtype=numpy.int64).reshape(len(ordered), len(masks))
+
+        # What the classes from i on can still add to every constraint
+        supply = numpy.zeros((len(ordered) + 1, len(masks)),
+                             dtype=numpy.int64)
+        remaining = [0] * (len(ordered) + 1)
+        for i in xrange(len(ordered) - 1, -1, -1):
+            size = len(ordered[i][1])
+            supply[i] = supply[i + 1] + self.signatures[i] * size
+            remaining[i] = remaining[i + 1] + size
+        self.supply = supply
+        self.remaining = remaining
+
+    def _settle(self, i, counts, picked, open_):
+        # Settles the constraints the classes from i on can't break, and
+        # flags the states that can no longer be finished
+        left = self.slots - picked
+        room = numpy.minimum(self.supply[i][None, :], left[:, None])
+
+        dead = (picked > self.slots) | (left > self.remaining[i])
+        dead |= (open_ & (counts + room < self.lows)).any(axis=1)
+
+        settle = open_ & (counts >= self.lows) & (
+            ~self.bounded | (counts + room <= self.highs))
+        counts = numpy.where(settle, self.settled, counts)
+
+        return counts, dead
+
+    def _decode(self, keys):
+        counts = keys[:, None] // self.multipliers % self.radix
+        return counts, keys // self.picked_multiplier
+
+    def _advance(self, i, counts, picked, n):
+        # The keys after taking *n* cards of class i, and which are alive
+        open_ = counts != self.settled
+        counts = counts + n * (open_ & (self.signatures[i] > 0))
+        over = (open_ & self.bounded & (counts > self.highs)).any(axis=1)
+
+        counts, dead = self._settle(i + 1, counts, picked + n, open_)
+        keys = counts.dot(self.multipliers) + \
+            (picked + n) * self.picked_multiplier
+
+        return keys, ~(dead | over)
+
+    def _solve(self):
+        # Forward: every state reachable before each class
+        counts = numpy.zeros((1, len(self.masks)), dtype=numpy.int64)
+        picked = numpy.zeros(1, dtype=numpy.int64)
+        counts, dead = self._settle(0, counts, picked,
+                                    counts != self.settled)
+
+        start = counts.dot(self.multipliers)
+        tables = [start if not dead[0] else start[:0]]
+        states = 1
+
+        # moves[i][n] is the key each state of level i reaches by taking n
+        # cards of class i, or -1 where that is a dead end
+        moves = []
+
+        for i, (_, cards) in enumerate(self.classes):
+            counts, picked = self._decode(tables[-1])
+            moves.append([])
+            for n in xrange(min(len(cards), self.slots) + 1):
+                keys, alive = self._advance(i, counts, picked, n)
+                moves[-1].append(numpy.where(alive, keys, -1))
+
+            following = numpy.concatenate(moves[-1])
+            tables.append(numpy.unique(following[following >= 0]))
+            states += len(tables[-1])
+            if states > self.max_states:
+                raise TooManyStates(
+                    'More than {0} states; this request has too many '
+                    'overlapping constraints to count exactly'.format(
+                        self.max_states))
+
+        # Backward: the ways to finish from every state, and where each
+        # choice leads
+        finished = (self.settled.dot(self.multipliers) +
+                    self.slots * self.picked_multiplier)
+        ways = [None] * len(tables)
+        ways[-1] = numpy.where(tables[-1] == finished, 1, 0).astype(
+            self.dtype)
+        targets = [None] * len(self.classes)
+
+        for i in xrange(len(self.classes) - 1, -1, -1):
+            table, following = tables[i], tables[i + 1]
+            total = numpy.zeros(len(table), dtype=self.dtype)
+            target = numpy.full((len(table), len(moves[i])), -1,
+                                dtype=numpy.intp)
+
+            for n, keys in enumerate(moves[i]):
+                if not len(following):
+                    break
+
+                position = numpy.minimum(
+                    numpy.searchsorted(following, keys), len(following) - 1)
+                found = following[position] == keys
+                found[found] = ways[i + 1][position[found]] > 0
+
+                target[found, n] = position[found]
+                total[found] += (self.binomials[i][n] *
+                                 ways[i + 1][position[found]])
+
+            ways[i] = total
+            targets[i] = target
+
+        self._tables = ways, targets
+
+    def count(self):
+        '''
+        The exact number of distinct kingdoms that satisfy every constraint.
+        Raises TooManyStates if that takes more than max_states states.
+        '''
+        if self.infeasible:
+            return 0
+
+        if self._tables is None:
+            self._solve()
+
+        ways = self._tables[0][0]
+        return int(ways[0]) if len(ways) else 0
+
+    def feasible(self):
+        return self.count() > 0
+
+    def sample(self, rng):
+        '''
+        Draws one kingdom uniformly from all feasible kingdoms, returned as a
+        list of cards.  Raises ValueError if there are none.
+        '''
+        total = self.count()
+        if not total:
+            raise ValueError('No kingdom satisfies your given parameters')
+
+        ways, targets = self._tables
+        chosen = list(self.pinned)
+        row = 0
+
+        for i, (_, cards) in enumerate(self.classes):
+            following = ways[i + 1]
+            pick = rng.randrange(total)
+
+            for n, position in enumerate(targets[i][row].tolist()):
+                if position < 0:
+                    continue
+
+                weight = self.binomials[i][n] * int(following[position])
+                if pick < weight:
+                    break
+                pick -= weight
+
+            chosen.extend(rng.sample(cards, n))
+            row = position
+            total = int(following[position])
+
+        return chosen
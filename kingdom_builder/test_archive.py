@@ -0,0 +1,149 @@
+import archive
+import dominion
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestArchive(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'kingdoms.karc')
+
+        self.collection = dominion.Collection(rng=1)
+        self.kingdoms = list(self.collection.generate_many(200))
+
+    def write(self, kingdoms, seed=0):
+        with archive.ArchiveWriter(self.path, self.collection) as writer:
+            for kingdom in kingdoms:
+                writer.write(kingdom, seed=seed)
+
+    def test_round_trip(self):
+        self.kingdoms[3].specials = sorted(self.collection.specials.values())
+        self.write(self.kingdoms[:150], seed=7)
+        # Appending keeps what is already there
+        self.write(self.kingdoms[150:], seed=8)
+
+        kingdoms = archive.Archive(self.path, self.collection)
+        self.assertEquals(os.path.getsize(self.path),
+                          32 + 32 * len(self.kingdoms))
+        self.assertEquals(len(kingdoms), 200)
+
+        for original, archived in zip(self.kingdoms, kingdoms):
+            self.assertEquals(archived.cards, original.cards)
+            self.assertEquals(sorted(archived.specials),
+                              sorted(original.specials))
+            self.assertEquals(archived.key(), original.key())
+            self.assertEquals(len(archived), 10)
+            self.assertEquals(archived.pprint(), original.pprint())
+
+        self.assertEquals(kingdoms[0].seed, 7)
+        self.assertEquals(kingdoms[-1].seed, 8)
+        self.assertEquals(kingdoms[3].specials, kingdoms.notes)
+
+        with self.assertRaises(IndexError):
+            kingdoms[200]
+
+    def test_run_seed(self):
+        # Without --seed a run still records a seed that regenerates it
+        def run(path, seed=None):
+            dominion.main(3, False, False, 'name', {}, None, seed=seed,
+                          path=os.devnull, archive=path)
+            return archive.Archive(path, self.collection)
+
+        first = run(self.path)
+        seeds = set(kingdom.seed for kingdom in first)
+        self.assertEquals(len(seeds), 1)
+
+        again = run(self.path + '2', seeds.pop())
+        self.assertEquals([kingdom.cards for kingdom in again],
+                          [kingdom.cards for kingdom in first])
+
+    def test_run_many(self):
+        # A run streams independent kingdoms, more than one draw of
+        # disjoint kingdoms could take from the catalog
+        dominion.main(30, False, False, 'name', {}, None, seed=3,
+                      path=os.devnull, archive=self.path,
+                      set_weights={'Intrigue': 0})
+
+        kingdoms = archive.Archive(self.path, self.collection)
+        self.assertEquals(len(kingdoms), 30)
+        for kingdom in kingdoms:
+            self.assertNotIn('Intrigue', [card.set for card in kingdom])
+
+    def test_seed_range(self):
+        with archive.ArchiveWriter(self.path, self.collection) as writer:
+            writer.write(self.kingdoms[0], seed=2 ** 64 - 1)
+            for seed in (-1, 2 ** 64):
+                with self.assertRaises(ValueError):
+                    writer.write(self.kingdoms[0], seed=seed)
+
+        self.assertEquals(archive.Archive(self.path, self.collection)[0].seed,
+                          2 ** 64 - 1)
+
+        # main() refuses before it writes anything
+        output = self.path + '.txt'
+        with self.assertRaises(ValueError):
+            dominion.main(1, False, False, 'name', {}, None, seed=-1,
+                          path=output, archive=self.path + '2')
+        self.assertFalse(os.path.exists(output))
+
+    def test_partial_record(self):
+        self.write(self.kingdoms[:2])
+        with open(self.path, 'ab') as f:
+            f.write('\x01' * 7)
+
+        # The torn record is dropped before appending
+        self.write(self.kingdoms[2:3])
+        kingdoms = archive.Archive(self.path, self.collection)
+        self.assertEquals(len(kingdoms), 3)
+        self.assertEquals([kingdom.cards for kingdom in kingdoms],
+                          [kingdom.cards for kingdom in self.kingdoms[:3]])
+
+    def test_containing(self):
+        self.write(self.kingdoms)
+        kingdoms = archive.Archive(self.path, self.collection)
+
+        names = [card.name for card in self.kingdoms[0].cards[:2]]
+        expected = [row for row, kingdom in enumerate(self.kingdoms)
+                    if set(names) <= set(card.name for card in kingdom)]
+
+        self.assertEquals(kingdoms.containing(names).tolist(), expected)
+        self.assertEquals(len(kingdoms.containing([])), 200)
+
+        for kingdom in kingdoms.select(kingdoms.containing(names[:1])):
+            self.assertIn(names[0], [card.name for card in kingdom])
+
+        with self.assertRaises(ValueError):
+            kingdoms.containing(['poop'])
+
+    def test_empty(self):
+        self.write([])
+        kingdoms = archive.Archive(self.path, self.collection)
+
+        self.assertEquals(len(kingdoms), 0)
+        self.assertEquals(len(kingdoms.containing(['Chapel'])), 0)
+
+    def test_short_kingdoms(self):
+        kingdom = dominion.Kingdom(3)
+        kingdom.cards = self.kingdoms[0].cards[:3]
+        self.write([kingdom])
+
+        archived = archive.Archive(self.path, self.collection)[0]
+        self.assertEquals(archived.cards, kingdom.cards)
+        self.assertEquals(archived.deck_cnt, 3)
+
+        kingdom.cards = self.kingdoms[0].cards + self.kingdoms[1].cards
+        with self.assertRaises(ValueError):
+            self.write([kingdom])
+
+    def test_catalog(self):
+        self.write(self.kingdoms[:1])
+        other = dominion.Collection('kingdom_builder/test_decks/test_deck.yml')
+
+        with self.assertRaises(ValueError):
+            archive.Archive(self.path, other)
+        with self.assertRaises(ValueError):
+            archive.ArchiveWriter(self.path, other)
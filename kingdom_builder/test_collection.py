@@ -1,4 +1,8 @@
 import dominion
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 
 
@@ -33,6 +37,37 @@ class TestDominion(unittest.TestCase):
 
         self.assertIn('test_yaml', cards)
 
+    def test_yaml_cache(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        card_set = os.path.join(directory, 'cards.yml')
+        shutil.copy('kingdom_builder/test_decks/test_deck.yml', card_set)
+
+        cards = dominion.load_cards(card_set)
+        self.assertTrue(os.path.exists(card_set + dominion.CACHE_SUFFIX))
+        self.assertEquals(cards, dominion.load_cards(card_set))
+        self.assertEquals(cards, dominion.load_cards(card_set,
+                                                     use_cache=False))
+
+        shutil.copy('kingdom_builder/test_decks/test_yaml.yml', card_set)
+        os.utime(card_set, (0, 0))
+
+        cards = dominion.load_cards(card_set)
+        self.assertIn('test_yaml', cards)
+
+        # Same mtime, different size: still noticed
+        with open(card_set, 'ab') as f:
+            f.write('\nExtra: 1\n')
+        os.utime(card_set, (0, 0))
+        self.assertEquals(dominion.load_cards(card_set)['Extra'], 1)
+
+        # A corrupt cache is rebuilt, whatever unpickling it raises
+        for junk in ('', 'cnosuchmodule\nThing\n.', '\x80\x02K\x01.'):
+            with open(card_set + dominion.CACHE_SUFFIX, 'wb') as f:
+                f.write(junk)
+            self.assertEquals(dominion.load_cards(card_set)['Extra'], 1)
+
     def test_flattening(self):
         flattened = dominion.flatten_cards(self.card_data)
 
@@ -74,6 +109,29 @@ class TestCard(unittest.TestCase):
         self.assertNotEquals(card1, card2)
         self.assertEquals(card1, card3)
 
+    def test_record(self):
+        card = dominion.Deck(dict(name='Card1', set='SetA', cost=3,
+                                  type=['Action', 'Attack'], extra='yes'),
+                             id=7)
+
+        self.assertEquals(card.id, 7)
+        self.assertEquals(card.extra, 'yes')
+        self.assertIn('Attack', card.type)
+        self.assertFalse(hasattr(card, '__dict__'))
+        self.assertFalse(hasattr(dominion.Deck(self.example_card), 'cost'))
+
+        with self.assertRaises(AttributeError):
+            card.name = 'Card2'
+
+        same = dominion.Deck(dict(name='Card1', set='SetA', cost=3,
+                                  type=['Action', 'Attack'], extra='yes'))
+        self.assertEquals(hash(card), hash(same))
+        self.assertEquals(len(set([card, same])), 1)
+
+        restored = pickle.loads(pickle.dumps(card, pickle.HIGHEST_PROTOCOL))
+        self.assertEquals(restored, card)
+        self.assertEquals(restored.id, 7)
+
 
 class TestCollection(unittest.TestCase):
     def test_classVersion(self):
@@ -294,6 +352,100 @@ class TestCollection(unittest.TestCase):
             self.assertIn('FileCard3', names)
             self.assertIn('FileCard4', names2)
 
+    def test_seeded(self):
+        def names(kingdoms):
+            return [[card.name for card in kingdom] for kingdom in kingdoms]
+
+        first = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=42)
+        second = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=42)
+
+        self.assertEquals(
+            names(first.create_kingdom(kingdoms=2,
+                                       type_constraints=dict(Action=(1, 3)))),
+            names(second.create_kingdom(kingdoms=2,
+                                        type_constraints=dict(Action=(1, 3)))))
+        self.assertEquals(names(first.generate_many(20)),
+                          names(second.generate_many(20)))
+
+    def test_spawn_rngs(self):
+        streams = dominion.spawn_rngs(3, 4)
+        draws = [rng.random() for rng in streams]
+
+        self.assertEquals(len(set(draws)), 4)
+        self.assertEquals(draws,
+                          [rng.random() for rng in dominion.spawn_rngs(3, 4)])
+        self.assertNotEquals(
+            draws, [rng.random() for rng in dominion.spawn_rngs(4, 4)])
+
+    def test_generate_parallel(self):
+        def generate(workers, ordered=True):
+            return [[card.name for card in kingdom]
+                    for kingdom in dominion.generate_parallel(
+                        25, workers, chunk_size=4, seed=9, ordered=ordered,
+                        card_set='kingdom_builder/test_decks/test_deck_3.yml',
+                        type_constraints=dict(Action=(1, 2)))]
+
+        kingdoms = generate(2)
+
+        self.assertEquals(len(kingdoms), 25)
+        self.assertEquals(kingdoms, generate(3))
+        self.assertEquals(sorted(kingdoms), sorted(generate(2, False)))
+
+        for names in kingdoms:
+            self.assertEquals(len(set(names)), 10)
+
+    def test_generate_many(self):
+        collection = dominion.Collection('kingdom_builder/test_decks/test_deck_3.yml')
+        kingdoms = list(collection.generate_many(50))
+
+        self.assertEquals(len(kingdoms), 50)
+        self.assertEquals(len(collection.cards), 41)
+
+        for kingdom in kingdoms:
+            self.assertEquals(len(kingdom), 10)
+            names = [card.name for card in kingdom]
+            self.assertEquals(len(set(names)), 10)
+
+        for kingdom in collection.generate_many(
+                30, type_constraints=dict(Action=(1, 2))):
+            actions = sum(1 for card in kingdom if 'Action' in card.type)
+            self.assertGreaterEqual(actions, 1)
+            self.assertLessEqual(actions, 2)
+
+        for kingdom in collection.generate_many(
+                30, set_constraints='FileSetD', pinned_cards=['FileCard3']):
+            names = [card.name for card in kingdom]
+            self.assertIn('FileCard3', names)
+
+            for card in kingdom:
+                self.assertEquals(card.set, 'FileSetD')
+
+        with self.assertRaises(ValueError):
+            list(collection.generate_many(1, type_constraints=dict(
+                Action=(1, 2), Unique=(0, 3))))
+
+    def test_generate_many_keeps_pinned(self):
+        collection = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=4)
+        pinned = ['FileCard3', 'FileCard4', 'FileCard5']
+
+        # The Actions overfill the kingdom, but only they get pruned
+        for kingdom in collection.generate_many(
+                30, deck_size=4, type_constraints=dict(Action=(3, 3)),
+                pinned_cards=pinned):
+            names = [card.name for card in kingdom]
+            self.assertEquals(len(names), 4)
+            for name in pinned:
+                self.assertIn(name, names)
+
+        with self.assertRaises(ValueError):
+            list(collection.generate_many(1, deck_size=2,
+                                          pinned_cards=pinned))
+        with self.assertRaises(ValueError):
+            collection.generate_batch(1, deck_size=2, pinned_cards=pinned)
+
 
 class TestDeck(unittest.TestCase):
     def test_creation(self):
@@ -321,3 +473,36 @@ class TestDeck(unittest.TestCase):
 
         for card in pruned_cards:
             self.assertNotIn(card, decks[0])
+
+
+class TestCardIndex(unittest.TestCase):
+    def setUp(self):
+        cards = dominion.load_cards('kingdom_builder/test_decks/test_deck.yml')
+        self.index = dominion.CardIndex(dominion.flatten_cards(cards))
+
+    def test_masks(self):
+        index = self.index
+
+        self.assertEquals(len(index), 3)
+        self.assertEquals(index.all, 0b111)
+        self.assertEquals(index.type_mask('Action'), 0b011)
+        self.assertEquals(index.type_mask('attack'), 0b010)
+        self.assertEquals(index.type_mask('poop'), 0)
+        self.assertEquals(index.set_mask(['FileSetA', 'filesetd']), 0b101)
+        self.assertEquals(index.set_mask('FileSetB'), 0b010)
+        self.assertEquals(index.set_mask(None), index.all)
+
+        self.assertEquals(
+            [card.name for card in index.cards_in(0b101)],
+            ['FileCard1', 'FileCard3'])
+        self.assertEquals(index.mask(index.cards_in(0b110)), 0b110)
+        self.assertEquals(index.count(0b101), 2)
+
+    def test_add(self):
+        card = dominion.Deck(dict(name='FileCard4', set='FileSetA',
+                                  type='Unique'))
+
+        self.assertEquals(self.index.add(card), 3)
+        self.assertEquals(self.index.add(card), 3)
+        self.assertEquals(self.index.type_mask('Unique'), 0b1100)
+        self.assertEquals(self.index.bit('FileCard4'), 0b1000)
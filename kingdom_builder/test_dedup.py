@@ -0,0 +1,113 @@
+import dedup
+import dominion
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestKey(unittest.TestCase):
+    def test_key(self):
+        collection = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=1)
+        kingdom = next(collection.generate_many(1))
+
+        self.assertEquals(len(kingdom.key()), 2 * len(kingdom))
+
+        # Little-endian whatever the machine, like archived keys
+        ids = sorted(card.id for card in kingdom.cards)
+        self.assertEquals(kingdom.key(),
+                          ''.join(chr(i & 0xff) + chr(i >> 8) for i in ids))
+
+        shuffled = dominion.Kingdom()
+        shuffled.cards = list(reversed(kingdom.cards))
+        self.assertEquals(shuffled.key(), kingdom.key())
+
+        shuffled.cards[0] = [card for card in collection.flattened
+                             if card not in kingdom.cards][0]
+        self.assertNotEquals(shuffled.key(), kingdom.key())
+
+    def test_fingerprint(self):
+        first = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml')
+        second = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml')
+        other = dominion.Collection('kingdom_builder/test_decks/test_deck.yml')
+
+        self.assertEquals(first.fingerprint, second.fingerprint)
+        self.assertNotEquals(first.fingerprint, other.fingerprint)
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'kingdoms.bloom')
+
+    def test_keyset(self):
+        keys = dedup.KeySet()
+
+        self.assertTrue(keys.add('ab'))
+        self.assertFalse(keys.add('ab'))
+        self.assertIn('ab', keys)
+        self.assertNotIn('cd', keys)
+        self.assertEquals(len(keys), 1)
+
+    def test_bloom_size(self):
+        bits, hashes = dedup.bloom_size(10 ** 7, 1e-6)
+
+        self.assertLess(bits // 8, 40 * 1024 * 1024)
+        self.assertEquals(hashes, 20)
+
+    def test_bloom(self):
+        with dedup.BloomIndex(self.path, capacity=1000,
+                              fingerprint='cards') as index:
+            self.assertTrue(index.add('ab'))
+            self.assertFalse(index.add('ab'))
+            self.assertTrue(index.add('cd'))
+            self.assertIn('ab', index)
+            self.assertNotIn('ef', index)
+            self.assertEquals(len(index), 2)
+
+        # Everything survives reopening, whatever capacity is asked for
+        with dedup.BloomIndex(self.path, capacity=10,
+                              fingerprint='cards') as index:
+            self.assertIn('ab', index)
+            self.assertIn('cd', index)
+            self.assertEquals(len(index), 2)
+
+        with self.assertRaises(ValueError):
+            dedup.BloomIndex(self.path, fingerprint='other cards')
+
+    def test_not_an_index(self):
+        with open(self.path, 'wb') as f:
+            f.write('x' * 100)
+
+        with self.assertRaises(ValueError):
+            dedup.BloomIndex(self.path)
+
+    def test_generate_unseen(self):
+        collection = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=1)
+
+        # FileSetB only has three pairs of cards
+        seen = dedup.KeySet()
+        kingdoms = list(collection.generate_many(
+            3, deck_size=2, set_constraints='FileSetB', seen=seen))
+        self.assertEquals(len(set(kingdom.key() for kingdom in kingdoms)), 3)
+        self.assertEquals(len(seen), 3)
+
+        with self.assertRaises(ValueError):
+            list(collection.generate_many(
+                1, deck_size=2, set_constraints='FileSetB', seen=seen))
+
+        with dedup.BloomIndex(self.path, capacity=1000,
+                              fingerprint=collection.fingerprint) as index:
+            first = list(collection.generate_many(20, seen=index))
+        with dedup.BloomIndex(self.path,
+                              fingerprint=collection.fingerprint) as index:
+            second = list(collection.generate_many(20, seen=index))
+            self.assertEquals(len(index), 40)
+
+        keys = set(kingdom.key() for kingdom in first + second)
+        self.assertEquals(len(keys), 40)
@@ -0,0 +1,73 @@
+import csv
+import dominion
+import gzip
+import json
+import os
+import output
+import shutil
+import tempfile
+import unittest
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'kingdoms')
+
+        collection = dominion.Collection(rng=1)
+        self.kingdoms = list(collection.generate_many(3))
+        self.kingdoms[1].specials.append('Add Colonies.')
+
+    def write(self, format, codec=None):
+        with output.writer(format, self.path, codec) as out:
+            for kingdom in self.kingdoms:
+                out.write(kingdom)
+
+        return out
+
+    def test_jsonl(self):
+        self.assertEquals(self.write('jsonl').count, 3)
+
+        with open(self.path) as f:
+            rows = [json.loads(line) for line in f]
+
+        self.assertEquals([row['kingdom'] for row in rows], [1, 2, 3])
+        self.assertEquals([card['name'] for card in rows[0]['cards']],
+                          [card.name for card in self.kingdoms[0]])
+        self.assertEquals(rows[0]['cards'][0]['set'],
+                          self.kingdoms[0].cards[0].set)
+        self.assertEquals(rows[1]['specials'], ['Add Colonies.'])
+
+    def test_gzip(self):
+        self.write('ndjson', codec='gzip')
+
+        with gzip.open(self.path) as f:
+            self.assertEquals(len(f.readlines()), 3)
+
+    def test_csv(self):
+        self.write('csv')
+
+        with open(self.path) as f:
+            rows = list(csv.reader(f))
+
+        self.assertEquals(len(rows), 4)
+        self.assertEquals(rows[0][0], 'kingdom')
+        self.assertEquals(rows[0][-1], 'notes')
+        self.assertEquals(rows[1][1:11],
+                          [card.name for card in self.kingdoms[0]])
+        self.assertEquals(rows[2][-1], 'Add Colonies.')
+
+    def test_text(self):
+        self.write('text')
+
+        with open(self.path) as f:
+            text = f.read()
+
+        self.assertTrue(text.startswith('Kingdom 1\n===========\n'))
+        self.assertIn(self.kingdoms[2].pprint(), text)
+        self.assertIn('Notes:\n - Add Colonies.', text)
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            output.writer('yaml', self.path)
@@ -0,0 +1,122 @@
+import archive
+import dominion
+import os
+import query
+import shutil
+import tempfile
+import unittest
+
+
+def cost(card):
+    return int(card.cost)
+
+
+def types(card):
+    if isinstance(card.type, basestring):
+        return [card.type.lower()]
+    return [card_type.lower() for card_type in card.type]
+
+
+class TestCardTable(unittest.TestCase):
+    def setUp(self):
+        self.collection = dominion.Collection()
+        self.table = query.CardTable(self.collection)
+        self.cards = self.collection.flattened
+
+    def test_columns(self):
+        self.assertEquals(len(self.table), len(self.cards))
+
+        for card in self.cards:
+            self.assertEquals(self.table.cost[card.id], cost(card))
+            self.assertEquals(
+                self.table.set_names[self.table.set_id[card.id]],
+                card.set.lower())
+
+    def test_where(self):
+        self.assertEquals(
+            self.table.cards(cost=(2, 4), types='Attack'),
+            [card for card in self.cards
+             if 2 <= cost(card) <= 4 and 'attack' in types(card)])
+
+        self.assertEquals(
+            self.table.cards(cost=(5, None), any_types=['Treasure', 'Victory'],
+                             exclude_types='Action'),
+            [card for card in self.cards if cost(card) >= 5 and
+             set(types(card)) & set(['treasure', 'victory']) and
+             'action' not in types(card)])
+
+        self.assertEquals(
+            self.table.cards(types=['Action', 'Duration'], sets='Seaside'),
+            [card for card in self.cards if card.set == 'Seaside' and
+             'duration' in types(card)])
+
+        self.assertEquals(self.table.cards(types='poop'), [])
+        self.assertEquals(self.table.cards(sets='poop'), [])
+
+    def test_available(self):
+        chapel = self.collection.cards['Chapel']
+        self.collection.remove(chapel)
+        table = query.CardTable(self.collection)
+
+        self.assertNotIn(chapel, table.cards(available=True))
+        self.assertIn(chapel, table.cards())
+
+
+class TestKingdomQuery(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'kingdoms.karc')
+
+        collection = dominion.Collection(rng=2)
+        self.kingdoms = list(collection.generate_many(300))
+        with archive.ArchiveWriter(path, collection) as writer:
+            for kingdom in self.kingdoms:
+                writer.write(kingdom)
+
+        self.query = query.KingdomQuery(archive.Archive(path, collection))
+
+    def names(self, row):
+        return set(card.name for card in self.kingdoms[row])
+
+    def test_rows(self):
+        first = sorted(self.names(0))
+        rows = self.query.rows(include=first[:1], exclude=first[1:2])
+
+        self.assertEquals(rows.tolist(), [
+            row for row in xrange(300) if first[0] in self.names(row) and
+            first[1] not in self.names(row)])
+
+        # Restricting to earlier results narrows them further
+        narrowed = self.query.rows(exclude=first[2:3], rows=rows)
+        self.assertEquals(narrowed.tolist(), [
+            row for row in rows if first[2] not in self.names(row)])
+
+        self.assertEquals(len(self.query.rows()), 300)
+        with self.assertRaises(ValueError):
+            self.query.rows(include=['poop'])
+
+    def test_cost_curve(self):
+        curves = self.query.cost_curve()
+
+        self.assertEquals(curves.shape, (300, 9))
+        for kingdom, curve in zip(self.kingdoms, curves):
+            expected = [0] * 9
+            for card in kingdom:
+                expected[cost(card)] += 1
+            self.assertEquals(curve.tolist(), expected)
+
+        self.assertEquals(self.query.cost_curve([5, 7]).tolist(),
+                          curves[[5, 7]].tolist())
+
+    def test_counts(self):
+        self.assertEquals(
+            self.query.type_counts('Attack').tolist(),
+            [sum(1 for card in kingdom if 'attack' in types(card))
+             for kingdom in self.kingdoms])
+
+        counts = self.query.card_counts()
+        chapel = self.query.table.card_id('Chapel')
+        self.assertEquals(counts[chapel], sum(
+            1 for row in xrange(300) if 'Chapel' in self.names(row)))
+        self.assertEquals(counts.sum(), 3000)
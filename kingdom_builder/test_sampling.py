@@ -0,0 +1,127 @@
+import dominion
+import numpy
+import sampling
+import unittest
+
+
+class TestSampling(unittest.TestCase):
+    def test_random_state(self):
+        rng = numpy.random.RandomState(3)
+        self.assertIs(sampling.random_state(rng), rng)
+
+        self.assertEquals(sampling.uniform(sampling.random_state(5)),
+                          sampling.uniform(sampling.random_state(5)))
+
+    def test_mask_matrix(self):
+        matrix = sampling.mask_matrix([0b101, 0, 0b1000], 4)
+
+        self.assertEquals(matrix.shape, (3, 4))
+        self.assertEquals(matrix.tolist(), [
+            [True, False, True, False],
+            [False, False, False, False],
+            [False, False, False, True]])
+
+    def test_sample_rows(self):
+        rng = sampling.random_state(0)
+        available = sampling.mask_matrix([0b111100, 0b000011, 0b111111], 6)
+
+        for _ in xrange(50):
+            rows = sampling.sample_rows(available, [3, 2, 0], rng)
+
+            self.assertEquals(len(rows[0]), 3)
+            self.assertEquals(len(set(rows[0])), 3)
+            self.assertTrue(set(rows[0]) <= set([2, 3, 4, 5]))
+            self.assertEquals(sorted(rows[1]), [0, 1])
+            self.assertEquals(len(rows[2]), 0)
+
+        with self.assertRaises(ValueError):
+            sampling.sample_rows(available, [5, 0, 0], rng)
+
+
+class TestGenerateBatch(unittest.TestCase):
+    def setUp(self):
+        self.collection = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml')
+
+    def test_batch(self):
+        kingdoms = self.collection.generate_batch(
+            40, type_constraints=dict(Action=(1, 2)), rng=7)
+
+        self.assertEquals(len(kingdoms), 40)
+        self.assertEquals(len(self.collection.cards), 41)
+
+        for kingdom in kingdoms:
+            names = [card.name for card in kingdom]
+            self.assertEquals(len(set(names)), 10)
+
+            actions = sum(1 for card in kingdom if 'Action' in card.type)
+            self.assertGreaterEqual(actions, 1)
+            self.assertLessEqual(actions, 2)
+
+    def test_reproducible(self):
+        first = self.collection.generate_batch(20, rng=11)
+        second = self.collection.generate_batch(
+            20, rng=numpy.random.RandomState(11))
+
+        self.assertEquals([kingdom.cards for kingdom in first],
+                          [kingdom.cards for kingdom in second])
+
+    def test_unconstrained(self):
+        kingdoms = self.collection.generate_batch(
+            30, pinned_cards=['FileCard3'], rng=2)
+
+        for kingdom in kingdoms:
+            names = [card.name for card in kingdom]
+            self.assertEquals(len(set(names)), 10)
+            self.assertIn('FileCard3', names)
+
+    def test_specials(self):
+        collection = dominion.Collection()
+        kingdoms = collection.generate_batch(2000, rng=5)
+        note, = collection.specials.values()
+
+        # The note is drawn from one random card of the kingdom
+        share = [sum(1 for card in kingdom
+                     if card.set.lower() in collection.specials) / 10.0
+                 for kingdom in kingdoms]
+        noted = [note in kingdom.specials for kingdom in kingdoms]
+
+        for kingdom_share, kingdom_noted in zip(share, noted):
+            if not kingdom_share:
+                self.assertFalse(kingdom_noted)
+        self.assertAlmostEqual(sum(noted) / 2000.0, sum(share) / 2000.0,
+                               delta=0.03)
+
+    def test_uneven_specials(self):
+        # Rows of different lengths take the per-kingdom path for their
+        # notes, which must follow the batch seed, not the collection's rng
+        def batch(collection_seed):
+            collection = dominion.Collection(rng=collection_seed)
+            constrain = collection._constrain_kingdom
+            calls = []
+
+            def uneven(*args, **kwargs):
+                kingdom, available = constrain(*args, **kwargs)
+                calls.append(kingdom)
+                if len(calls) == 1:
+                    # One kingdom past the deck size
+                    extra = collection.index.cards_in(available)[
+                        :11 - len(kingdom)]
+                    kingdom.cards.extend(extra)
+                    available &= ~collection.index.mask(extra)
+                return kingdom, available
+
+            collection._constrain_kingdom = uneven
+            return collection.generate_batch(
+                200, type_constraints=dict(Action=(2, 4)), rng=5)
+
+        first, second = batch(1), batch(2)
+        self.assertEquals(sorted(set(len(kingdom) for kingdom in first)),
+                          [10, 11])
+        self.assertEquals([kingdom.specials for kingdom in first],
+                          [kingdom.specials for kingdom in second])
+
+    def test_not_enough(self):
+        with self.assertRaises(ValueError):
+            self.collection.generate_batch(3, type_constraints=dict(
+                Action=(1, 2), Unique=(0, 3)))
@@ -0,0 +1,204 @@
+from itertools import combinations
+import dominion
+import random
+import solver
+import time
+import unittest
+
+
+class TestKingdomSolver(unittest.TestCase):
+    def setUp(self):
+        types = ['Action', ['Action', 'Attack'], 'Victory', 'Treasure']
+        self.cards = [
+            dominion.Deck(dict(name='Card{0}'.format(i),
+                               set='Set{0}'.format(i % 3),
+                               type=types[i % len(types)], cost=i % 5))
+            for i in xrange(14)]
+        self.index = dominion.CardIndex(self.cards)
+
+    def constraints(self):
+        index = self.index
+        return [(index.type_mask('Action'), (2, 4)),
+                (index.type_mask('Attack'), (1, None)),
+                (index.set_mask('Set0'), (0, 2)),
+                (index.cost_mask(4), (1, 1))]
+
+    def brute_force(self, deck_size, constraints, pinned=()):
+        index = self.index
+        pinned_mask = index.mask(pinned)
+        pool = [card for card in self.cards if card not in pinned]
+        found = []
+
+        for combo in combinations(pool, deck_size - len(pinned)):
+            mask = index.mask(combo) | pinned_mask
+            if all(low <= index.count(mask & limit_mask) and
+                   (high is None or index.count(mask & limit_mask) <= high)
+                   for limit_mask, (low, high) in constraints):
+                found.append(frozenset(combo) | frozenset(pinned))
+
+        return found
+
+    def test_count(self):
+        for deck_size in (3, 5):
+            expected = self.brute_force(deck_size, self.constraints())
+            kingdom_solver = solver.KingdomSolver(
+                self.index, self.index.all, deck_size, self.constraints())
+
+            self.assertEquals(kingdom_solver.count(), len(expected))
+
+        pinned = [self.cards[1]]
+        kingdom_solver = solver.KingdomSolver(
+            self.index, self.index.all, 4, self.constraints(), pinned)
+        self.assertEquals(kingdom_solver.count(),
+                          len(self.brute_force(4, self.constraints(), pinned)))
+
+    def test_infeasible(self):
+        index = self.index
+        kingdom_solver = solver.KingdomSolver(
+            index, index.all, 4, [(index.type_mask('Attack'), (5, None))])
+
+        self.assertFalse(kingdom_solver.feasible())
+        with self.assertRaises(ValueError):
+            kingdom_solver.sample(random.Random(1))
+
+        self.assertFalse(solver.KingdomSolver(
+            index, index.all, 1, pinned=self.cards[:2]).feasible())
+        self.assertFalse(solver.KingdomSolver(
+            index, index.all, 15).feasible())
+
+    def test_sample(self):
+        rng = random.Random(3)
+        valid = set(self.brute_force(4, self.constraints()))
+        kingdom_solver = solver.KingdomSolver(
+            self.index, self.index.all, 4, self.constraints())
+
+        seen = set()
+        for _ in xrange(2000):
+            kingdom = frozenset(kingdom_solver.sample(rng))
+            self.assertIn(kingdom, valid)
+            seen.add(kingdom)
+
+        # Uniform sampling should find nearly every one of the few hundred
+        # feasible kingdoms.
+        self.assertGreater(len(seen), 0.9 * len(valid))
+
+    def test_state_budget(self):
+        kingdom_solver = solver.KingdomSolver(
+            self.index, self.index.all, 5, self.constraints(), max_states=5)
+
+        with self.assertRaises(solver.TooManyStates):
+            kingdom_solver.count()
+
+
+class TestExactBackend(unittest.TestCase):
+    def collection(self):
+        return dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=2)
+
+    def test_create_kingdom(self):
+        kingdoms = self.collection().create_kingdom(
+            kingdoms=3, type_constraints=dict(Action=(1, 2), Duration=(0, 1)),
+            pinned_cards=['FileCard3'], backend='exact')
+
+        names = [card.name for kingdom in kingdoms for card in kingdom]
+        self.assertEquals(len(names), 30)
+        self.assertEquals(len(set(names)), 30)
+        self.assertIn('FileCard3', names)
+
+        for kingdom in kingdoms:
+            actions = sum(1 for card in kingdom if 'Action' in card.type)
+            durations = sum(1 for card in kingdom if 'Duration' in card.type)
+            self.assertGreaterEqual(actions, 1)
+            self.assertLessEqual(actions, 2)
+            self.assertLessEqual(durations, 1)
+
+    def test_infeasible(self):
+        with self.assertRaises(ValueError):
+            self.collection().create_kingdom(
+                type_constraints=dict(Action=(6, 6), Unique=(6, 6)),
+                backend='exact')
+
+        with self.assertRaises(ValueError):
+            list(self.collection().generate_many(
+                2, type_constraints=dict(Action=(6, 6), Unique=(6, 6)),
+                backend='exact'))
+
+    def test_failure_keeps_cards(self):
+        # Only the first two of three kingdoms can get two of the four
+        # Duration cards
+        collection = self.collection()
+        available = collection.available
+
+        with self.assertRaises(ValueError):
+            collection.create_kingdom(
+                kingdoms=3, type_constraints=dict(Duration=(2, None)),
+                pinned_cards=['FileCard3'], backend='exact')
+
+        self.assertEquals(collection.available, available)
+
+    def test_set_counts(self):
+        for kingdom in self.collection().generate_many(
+                20, set_constraints=dict(FileSetA=(2, 2), FileSetB=(0, 1)),
+                backend='exact'):
+            sets = [card.set for card in kingdom]
+            self.assertEquals(sets.count('FileSetA'), 2)
+            self.assertLessEqual(sets.count('FileSetB'), 1)
+
+        with self.assertRaises(ValueError):
+            self.collection().create_kingdom(
+                set_constraints=dict(FileSetA=(2, 2)))
+
+
+class TestCounting(unittest.TestCase):
+    def setUp(self):
+        self.collection = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml')
+
+    def test_count_kingdoms(self):
+        collection = self.collection
+
+        # 41 cards, no constraints: C(41, 3)
+        self.assertEquals(collection.count_kingdoms(deck_size=3), 10660)
+
+        # Exactly one of the 4 Duration cards and two of the other 37
+        self.assertEquals(collection.count_kingdoms(
+            deck_size=3, type_constraints=dict(Duration=(1, 1))), 4 * 666)
+
+        self.assertEquals(collection.count_kingdoms(
+            deck_size=3, set_constraints='FileSetB'), 1)
+        self.assertEquals(collection.count_kingdoms(
+            deck_size=3, type_constraints=dict(duration=(1, 1))),
+            collection.count_kingdoms(
+                deck_size=3, type_constraints=dict(Duration=(1, 1))))
+
+    def test_is_feasible(self):
+        collection = self.collection
+
+        self.assertTrue(collection.is_feasible(
+            type_constraints=dict(Action=(1, 2))))
+        self.assertFalse(collection.is_feasible(
+            type_constraints=dict(Action=(6, 6), Unique=(6, 6))))
+        self.assertFalse(collection.is_feasible(
+            set_constraints=['FileSetB'], pinned_cards=['FileCard3']))
+
+        # The cached answer follows the cards left in the collection
+        collection.create_kingdom(kingdoms=3)
+        self.assertFalse(collection.is_feasible(deck_size=12))
+
+    def test_full_catalog(self):
+        # Overlapping type, set and cost constraints on every card: the
+        # state space that has to stay bounded
+        collection = dominion.Collection()
+        started = time.time()
+
+        count = collection.count_kingdoms(
+            type_constraints=dict(
+                action=(5, 8), attack=(1, 3), duration=(0, 2),
+                knight=(0, 1), looter=(0, 1), reaction=(0, 2),
+                treasure=(0, 2), victory=(0, 2)),
+            set_constraints={'Base Set': (1, 4), 'Intrigue': (1, 4),
+                             'Seaside': (0, 3), 'Prosperity': (0, 3)},
+            cost_constraints={2: (1, 3), 3: (1, 3), 5: (2, 4)})
+
+        self.assertEquals(count, 41164694124631)
+        self.assertLess(time.time() - started, 20)
@@ -0,0 +1,151 @@
+from collections import Counter
+import dominion
+import random
+import sampling
+import unittest
+import weights
+
+
+class TestWeightedSampler(unittest.TestCase):
+    def test_tree(self):
+        sampler = weights.WeightedSampler([1, 2, 0, 4, 3])
+
+        self.assertEquals(len(sampler), 5)
+        self.assertEquals(sampler.total, 10)
+        self.assertEquals([sampler.find(point) for point in
+                           [0, 0.5, 1, 2.9, 3, 6.9, 7, 9.9]],
+                          [0, 0, 1, 1, 3, 3, 4, 4])
+
+        sampler.update(3, 0)
+        sampler.update(2, 5)
+        self.assertEquals(sampler.total, 11)
+        self.assertEquals(sampler.find(3), 2)
+        self.assertEquals(sampler.find(8), 4)
+
+        with self.assertRaises(ValueError):
+            sampler.update(1, -1)
+        with self.assertRaises(ValueError):
+            weights.WeightedSampler([1, -1])
+
+    def test_draw(self):
+        rng = random.Random(0)
+        sampler = weights.WeightedSampler([1, 0, 3])
+
+        counts = Counter(sampler.draw(rng) for _ in xrange(4000))
+        self.assertEquals(counts[1], 0)
+        self.assertAlmostEqual(counts[2] / 4000.0, 0.75, delta=0.03)
+
+        with self.assertRaises(ValueError):
+            weights.WeightedSampler([0, 0]).draw(rng)
+
+    def test_sample(self):
+        rng = random.Random(1)
+        sampler = weights.WeightedSampler([1, 1, 1, 0, 50])
+
+        for _ in xrange(100):
+            chosen = sampler.sample(3, rng, exclude=[1])
+            self.assertEquals(sorted(chosen), [0, 2, 4])
+
+        # Weights are put back after every sample
+        self.assertEquals(sampler.weights, [1, 1, 1, 0, 50])
+        self.assertEquals(sampler.total, 53)
+
+        with self.assertRaises(ValueError):
+            sampler.sample(5, rng)
+        with self.assertRaises(ValueError):
+            sampler.sample(3, rng, exclude=[0, 1])
+        self.assertEquals(sampler.total, 53)
+
+        firsts = Counter(sampler.sample(2, rng)[0] for _ in xrange(1000))
+        self.assertGreater(firsts[4], 900)
+
+    def test_card_weights(self):
+        cards = [dominion.Deck(dict(name='A', set='One')),
+                 dominion.Deck(dict(name='B', set='Two')),
+                 dominion.Deck(dict(name='C', set='two'))]
+
+        self.assertEquals(weights.card_weights(cards), [1, 1, 1])
+        self.assertEquals(
+            weights.card_weights(cards, {'B': 3, 'C': 0}, {'TWO': 2}),
+            [1, 6, 0])
+
+
+class TestWeightedCollection(unittest.TestCase):
+    def setUp(self):
+        self.collection = dominion.Collection(
+            'kingdom_builder/test_decks/test_deck_3.yml', rng=3)
+
+    def sets(self, kingdoms):
+        return Counter(card.set for kingdom in kingdoms for card in kingdom)
+
+    def test_generate_many(self):
+        self.collection.set_weights(sets={'FileSetB': 0, 'FileSetD': 10})
+        counts = self.sets(self.collection.generate_many(100))
+
+        self.assertNotIn('FileSetB', counts)
+        self.assertGreater(counts['FileSetD'], counts['FileSetA'])
+
+        # A card weighted 0 is still in a kingdom when it is pinned
+        for kingdom in self.collection.generate_many(
+                10, pinned_cards=['FileCard3'],
+                type_constraints=dict(Action=(1, 3))):
+            self.assertEquals(len(kingdom), 10)
+            self.assertIn('FileCard3', [card.name for card in kingdom])
+
+        with self.assertRaises(ValueError):
+            list(self.collection.generate_many(1, backend='exact'))
+
+        self.collection.set_weights()
+        counts = self.sets(self.collection.generate_many(100))
+        self.assertIn('FileSetB', counts)
+
+    def test_type_constraints(self):
+        collection = self.collection
+        collection.set_weights(cards={'FileCard1': 0}, sets={'FileSetB': 0})
+
+        # Samplers are built once per batch, not once per kingdom and type
+        built = []
+        sampler = collection._sampler
+        collection._sampler = lambda available: (built.append(available) or
+                                                 sampler(available))
+
+        for kingdom in collection.generate_many(
+                50, type_constraints=dict(Action=(2, 2), Unique=(1, None))):
+            names = [card.name for card in kingdom]
+            self.assertEquals(len(set(names)), 10)
+            self.assertEquals(
+                sum(1 for card in kingdom if 'Action' in card.type), 2)
+            self.assertNotIn('FileCard1', names)
+            for card in kingdom:
+                self.assertNotEquals(card.set, 'FileSetB')
+
+        self.assertEquals(len(built), 3)
+
+    def test_create_kingdom(self):
+        self.collection.set_weights(cards={'FileCard1': 0},
+                                    sets={'FileSetB': 0})
+        kingdoms = self.collection.create_kingdom(
+            kingdoms=2, type_constraints=dict(Action=(1, None)))
+
+        for kingdom in kingdoms:
+            self.assertEquals(len(kingdom), 10)
+            for card in kingdom:
+                self.assertNotEquals(card.set, 'FileSetB')
+                self.assertNotEquals(card.name, 'FileCard1')
+
+    def test_generate_batch(self):
+        self.collection.set_weights(sets={'FileSetB': 0, 'FileSetD': 10})
+        counts = self.sets(self.collection.generate_batch(100, rng=4))
+
+        self.assertNotIn('FileSetB', counts)
+        self.assertGreater(counts['FileSetD'], counts['FileSetA'])
+
+    def test_sample_rows(self):
+        available = sampling.mask_matrix([0b1111] * 200, 4)
+        rows = sampling.sample_rows(available, [2] * 200,
+                                    sampling.random_state(5),
+                                    weights=[1, 0, 1, 20])
+
+        firsts = Counter(row[0] for row in rows)
+        self.assertNotIn(1, [id for row in rows for id in row])
+        self.assertGreater(firsts[3], 150)
@@ -0,0 +1,143 @@
+'''
+Weighted card draws without replacement.
+
+WeightedSampler keeps one weight per card id in a Fenwick (binary indexed)
+tree, so changing a weight and drawing a card are both O(log n): a draw
+walks down the tree to the id whose running total passes a uniform point,
+instead of rebuilding cumulative weights for every pick.  Drawing without
+replacement zeroes each winner as it goes and puts the weights back
+afterwards, so one sampler serves any number of independent draws.
+'''
+from itertools import izip
+
+
+def card_weights(cards, weights=None, set_weights=None):
+    '''
+    The weight of each of *cards* (in id order): its entry in *weights*
+    ({name: weight}) times its set's entry in *set_weights* ({set: weight},
+    case-insensitive), either defaulting to 1.
+    '''
+    weights = weights or {}
+    set_weights = dict((name.lower(), weight)
+                       for name, weight in (set_weights or {}).iteritems())
+
+    return [float(weights.get(card.name, 1)) *
+            set_weights.get(card.set.lower(), 1) for card in cards]
+
+
+class WeightedSampler(object):
+    '''
+    A Fenwick tree over the non-negative *weights* of ids 0..n-1.  A weight
+    of 0 means the id is never drawn.
+    '''
+    def __init__(self, weights):
+        weights = [float(weight) for weight in weights]
+        if any(weight < 0 for weight in weights):
+            raise ValueError('Card weights can\'t be negative')
+
+        self.weights = weights
+        self.positive = sum(1 for weight in weights if weight > 0)
+
+        # Linear time build: every node passes its sum on to its parent
+        tree = [0.0] + weights
+        for i in xrange(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self.tree = tree
+
+        self.top = 1
+        while self.top * 2 <= len(weights):
+            self.top *= 2
+
+    def __len__(self):
+        return len(self.weights)
+
+    @property
+    def total(self):
+        total = 0.0
+        i = len(self.weights)
+        while i:
+            total += self.tree[i]
+            i &= i - 1
+        return total
+
+    def update(self, card_id, weight):
+        '''
+        Sets the weight of *card_id*.
+        '''
+        if weight < 0:
+            raise ValueError('Card weights can\'t be negative')
+
+        old = self.weights[card_id]
+        self.positive += (weight > 0) - (old > 0)
+        self.weights[card_id] = weight
+
+        delta = weight - old
+        tree = self.tree
+        i = card_id + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+    def find(self, point):
+        '''
+        The id whose share of the running total contains *point*, for
+        0 <= point < total.
+        '''
+        tree = self.tree
+        position = 0
+        step = self.top
+
+        while step:
+            following = position + step
+            if following < len(tree) and tree[following] <= point:
+                position = following
+                point -= tree[following]
+            step >>= 1
+
+        return position
+
+    def draw(self, rng):
+        '''
+        One id, drawn with probability proportional to its weight.
+        '''
+        if not self.positive:
+            raise ValueError('Every card has a weight of 0')
+
+        while True:
+            card_id = self.find(rng.random() * self.total)
+
+            # Rounding can land past the end or on an emptied id
+            if card_id < len(self.weights) and self.weights[card_id] > 0:
+                return card_id
+
+    def sample(self, k, rng, exclude=()):
+        '''
+        *k* distinct ids drawn in turn by weight, skipping the ids in
+        *exclude*.  Raises ValueError if fewer than *k* ids can be drawn.
+        '''
+        removed = [card_id for card_id in set(exclude)
+                   if self.weights[card_id] > 0]
+        saved = [self.weights[card_id] for card_id in removed]
+
+        try:
+            for card_id in removed:
+                self.update(card_id, 0.0)
+
+            if self.positive < k:
+                raise ValueError('Not enough cards with your given '
+                                 'parameters')
+
+            chosen = []
+            for _ in xrange(k):
+                card_id = self.draw(rng)
+                chosen.append(card_id)
+                removed.append(card_id)
+                saved.append(self.weights[card_id])
+                self.update(card_id, 0.0)
+
+            return chosen
+        finally:
+            for card_id, weight in izip(removed, saved):
+                self.update(card_id, weight)
@@ -0,0 +1,93 @@
+'''
+Rough timings for the Elo code.  Run from the repository root:
+
+    python rankings/benchmarks.py [--games N] [--players N] [--pool N]
+                                  [--repeat N]
+'''
+import random
+import timeit
+
+import elo
+import engine
+
+
+def random_games(games, players, seed=0):
+    rng = random.Random(seed)
+    return [[('p{0}'.format(i), rng.uniform(1000, 1600), rng.randint(0, 60))
+             for i in xrange(players)] for _ in xrange(games)]
+
+
+def game_results(games=10000, players=6, repeat=5):
+    '''
+    Times rating *games* games of *players* players pair by pair and
+    simultaneously.  Returns (sequential, simultaneous) best times in
+    seconds.
+    '''
+    games = random_games(games, players)
+
+    def sequential():
+        for game in games:
+            elo.game_results(players=game)
+
+    def simultaneous():
+        for game in games:
+            elo.game_results(players=game, simultaneous=True)
+
+    return (min(timeit.repeat(sequential, number=1, repeat=repeat)),
+            min(timeit.repeat(simultaneous, number=1, repeat=repeat)))
+
+
+def replay(games=10000, players=6, pool=8, repeat=5):
+    '''
+    Times engine.replay on *games* games of *players* drawn from *pool*
+    regulars, by waves and game by game.  Returns (games per wave, waves,
+    loop) with the best times in seconds.
+    '''
+    rng = random.Random(0)
+    names = ['p{0}'.format(i) for i in xrange(pool)]
+    log = engine.GameLog.from_games(
+        [dict((name, rng.randint(0, 60))
+              for name in rng.sample(names, min(players, pool)))
+         for _ in xrange(games)])
+
+    def replay_with(minimum):
+        def run():
+            saved = engine.MIN_WAVE
+            engine.MIN_WAVE = minimum
+            try:
+                engine.replay(log)
+            finally:
+                engine.MIN_WAVE = saved
+        return min(timeit.repeat(run, number=1, repeat=repeat))
+
+    width = len(log) / float(log.waves().max() + 1)
+    return width, replay_with(0), replay_with(float('inf'))
+
+
+def main(games, players, pool, repeat):
+    sequential, simultaneous = game_results(games, players, repeat)
+    print '{0} games of {1} players'.format(games, players)
+    print 'Sequential:   {0:.4f}s'.format(sequential)
+    print 'Simultaneous: {0:.4f}s'.format(simultaneous)
+    print 'Speedup: {0:.1f}x'.format(sequential / simultaneous)
+
+    width, waves, loop = replay(games, players, pool, repeat)
+    print 'Replay among {0} players, {1:.1f} games per wave'.format(
+        pool, width)
+    print 'By waves:     {0:.4f}s'.format(waves)
+    print 'Game by game: {0:.4f}s'.format(loop)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Times the Elo calculations.')
+    parser.add_argument('--games', type=int, default=10000)
+    parser.add_argument('--players', type=int, default=6)
+    parser.add_argument('--pool', type=int, default=8,
+                        help='How many players the replay games draw on.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='How many times to repeat each measurement.')
+
+    args = parser.parse_args()
+    main(args.games, args.players, args.pool, args.repeat)
@@ -12,14 +12,16 @@ class PlayerStat(object):
             id=self.id, rating=self.rating, score=self.score)
 
 
-def find_k(rating):
-    k_factor = [
-        (2100, 32),
-        (2400, 24),
-        (None, 16)
-    ]
-
-    for k_rating, k_value in k_factor:
+# (ratings below this, K) in increasing order; None ends the table
+K_FACTORS = [
+    (2100, 32),
+    (2400, 24),
+    (None, 16)
+]
+
+
+def find_k(rating, k_factors=K_FACTORS):
+    for k_rating, k_value in k_factors:
         try:
             if rating < int(k_rating):
                 return k_value
@@ -39,7 +41,54 @@ def adjust_rating(rating, expected_score, win, k_value):
     return rating + k_value * (win - expected_score)
 
 
-def game_results(players=[]):
+def expected_scores(ratings):
+    '''
+    The matrix of expected_score(ratings[i], ratings[j]) for every pair.
+    '''
+    q = [10 ** (float(rating) / 400) for rating in ratings]
+    return [[q_a / (q_a + q_b) for q_b in q] for q_a in q]
+
+
+def simultaneous_results(players=[], k_factors=K_FACTORS):
+    '''
+    Like game_results, but every pair is rated from the pre-game ratings
+    and all the changes are applied together, so the result doesn't depend
+    on the order the players are listed in.
+    '''
+    players = [PlayerStat(*player) for player in players]
+    players = sorted(players, key=lambda x: x.score, reverse=True)
+
+    opponents = len(players) - 1
+    if opponents < 1:
+        return players
+
+    ratings = [player.rating for player in players]
+    expected = expected_scores(ratings)
+
+    for idx, player in enumerate(players):
+        delta = 0.0
+        for o, opponent in enumerate(players):
+            if o == idx:
+                continue
+
+            if player.score > opponent.score:
+                win = 1
+            elif player.score < opponent.score:
+                win = 0
+            else:
+                win = 0.5
+            delta += win - expected[idx][o]
+
+        k = find_k(ratings[idx], k_factors)/opponents
+        player.rating = ratings[idx] + k * delta
+
+    return players
+
+
+def game_results(players=[], k_factors=K_FACTORS, simultaneous=False):
+    if simultaneous:
+        return simultaneous_results(players, k_factors)
+
     players = [PlayerStat(*player) for player in players]
     players = sorted(players, key=lambda x: x.score, reverse=True)
 
@@ -52,13 +101,35 @@ def game_results(players=[]):
 
             expected = expected_score(winner.rating, opponent.rating)
 
-            k = find_k(winner.rating)/(len(players) - 1)
+            k = find_k(winner.rating, k_factors)/(len(players) - 1)
             rating = adjust_rating(winner.rating, expected, elo_score, k)
 
             expected = expected_score(opponent.rating, winner.rating)
-            k = find_k(opponent.rating)/(len(players) - 1)
+            k = find_k(opponent.rating, k_factors)/(len(players) - 1)
 
             output[idx + 1 + o].rating = adjust_rating(
                 opponent.rating, expected, 1 - elo_score, k)
             winner.rating = rating
     return output
+
+
+def apply_games(games, ratings, starting_elo, k_factors=K_FACTORS,
+                simultaneous=False):
+    '''
+    Rates each of *games* ({player: score} dicts) in turn, updating the
+    {player: rating} dict *ratings* in place, and yields every game once it
+    has been applied.  New players start at *starting_elo*.
+    '''
+    for game in games:
+        results = []
+        for player in game:
+            if player == '_game':
+                continue
+            results.append((player, ratings.get(player, starting_elo),
+                            game[player]))
+
+        for player in game_results(players=results, k_factors=k_factors,
+                                   simultaneous=simultaneous):
+            ratings[player.id] = player.rating
+
+        yield game
@@ -0,0 +1,231 @@
+'''
+Replays a whole game log with NumPy.
+
+A log is every game's players (as indices into a name list) and scores,
+packed into padded (games, seats) arrays.  Games that share no player don't
+depend on each other, so the log is cut into waves of independent games and
+each wave is rated at once: one (games, seats, seats) matrix of expected
+scores per wave instead of a Python loop per pair.
+
+That only pays off when waves are wide.  A small group of regulars who
+play almost every game leaves about one game per wave, and then the NumPy
+overhead per wave costs far more than it saves; replay then rates the games
+one at a time with plain floats instead.
+
+Within a game every pair is rated from the pre-game ratings, exactly as
+elo.game_results(simultaneous=True) does.  For two player games that is the
+same as the default sequential update.
+'''
+from itertools import izip
+
+import numpy as np
+
+import elo
+import results
+
+STARTING_ELO = 1200
+
+# Fewer games than this per wave on average and replay goes game by game;
+# about where the two break even (see benchmarks.py)
+MIN_WAVE = 8
+
+
+class GameLog(object):
+    '''
+    *players* and *scores* are (games, seats) arrays padded with -1 player
+    indices; *names* maps indices back to player names.
+    '''
+    def __init__(self, names, players, scores, labels=None):
+        self.names = names
+        self.players = players
+        self.scores = scores
+        self.labels = labels
+
+    def __len__(self):
+        return len(self.players)
+
+    @classmethod
+    def from_games(cls, games):
+        '''
+        Packs an iterable of {player: score} dicts, the format of
+        game_results.json.  A '_game' key labels the game.
+        '''
+        index = {}
+        names = []
+        seated = []
+        results = []
+        sizes = []
+        labels = []
+
+        for game in games:
+            size = 0
+            for name, score in game.iteritems():
+                if name == '_game':
+                    continue
+                if name not in index:
+                    index[name] = len(names)
+                    names.append(name)
+                seated.append(index[name])
+                results.append(score)
+                size += 1
+
+            sizes.append(size)
+            labels.append(game.get('_game'))
+
+        # Scatter the flat lists into padded rows in one go
+        sizes = np.array(sizes, dtype=np.int64)
+        rows = np.repeat(np.arange(len(sizes)), sizes)
+        starts = np.cumsum(sizes) - sizes
+        columns = np.arange(len(seated)) - np.repeat(starts, sizes)
+
+        seats = sizes.max() if len(sizes) else 0
+        players = np.full((len(sizes), seats), -1, dtype=np.int32)
+        scores = np.zeros((len(sizes), seats))
+        players[rows, columns] = seated
+        scores[rows, columns] = results
+
+        return cls(names, players, scores, labels)
+
+    @classmethod
+    def load(cls, results_file):
+        return cls.from_games(results.read_games(results_file))
+
+    def waves(self):
+        '''
+        The wave of every game: one more than the latest wave of any of its
+        players, so games in a wave never share a player.
+        '''
+        latest = [-1] * len(self.names)
+        waves = []
+
+        for row in self.players.tolist():
+            row = [player for player in row if player >= 0]
+            wave = max([latest[player] for player in row] or [-1]) + 1
+            for player in row:
+                latest[player] = wave
+            waves.append(wave)
+
+        return np.array(waves, dtype=np.int64)
+
+
+class Replay(object):
+    '''
+    The outcome of rating a GameLog: *after* holds every player's rating
+    after each game they played, aligned with the log's players array, and
+    *ratings* the final rating of every player.
+    '''
+    def __init__(self, log, ratings, after):
+        self.log = log
+        self.ratings = ratings
+        self.after = after
+
+    def final(self):
+        return dict(zip(self.log.names, self.ratings.tolist()))
+
+    def trajectory(self, name):
+        '''
+        *name*'s rating after each of their games, in order.
+        '''
+        seats = self.log.players == self.log.names.index(name)
+        return self.after[seats]
+
+
+def k_factors(ratings, seats, k_factors=elo.K_FACTORS):
+    # elo.find_k for every rating, divided (as ints, like game_results)
+    # among each game's opponents
+    limits = [limit for limit, _ in k_factors if limit is not None]
+    values = np.array([value for _, value in k_factors])
+    k = values[np.searchsorted(limits, ratings, side='right')]
+
+    return k // np.maximum(seats - 1, 1)[:, None]
+
+
+def rate(ratings, players, scores, k_table=elo.K_FACTORS):
+    '''
+    Rates a batch of games that share no player.  *ratings* is the rating of
+    every player and *players*/*scores* are padded (games, seats) arrays;
+    returns the new ratings of every seat (NaN for padding).
+    '''
+    seated = players >= 0
+    before = np.where(seated, ratings[players], np.nan)
+
+    q = 10 ** (before / 400)
+    expected = q[:, :, None] / (q[:, :, None] + q[:, None, :])
+    actual = 0.5 * (1 + np.sign(scores[:, :, None] - scores[:, None, :]))
+
+    pairs = seated[:, :, None] & seated[:, None, :]
+    pairs &= ~np.eye(players.shape[1], dtype=bool)
+    delta = np.where(pairs, actual - expected, 0).sum(axis=2)
+
+    k = k_factors(before, seated.sum(axis=1), k_table)
+    return before + k * delta
+
+
+def rate_games(ratings, players, scores, k_table=elo.K_FACTORS):
+    '''
+    Rates the games in *players*/*scores* (as for rate, but nested lists)
+    one after another, updating the list *ratings* in place.  Returns every
+    seat's rating after its game, None for padding.
+    '''
+    # 10 ** (rating / 400) of every player, kept up to date with *ratings*
+    q = [10 ** (rating / 400) for rating in ratings]
+    after = []
+
+    for row, score in izip(players, scores):
+        seats = [seat for seat, player in enumerate(row) if player >= 0]
+        opponents = max(len(seats) - 1, 1)
+        rated = [None] * len(row)
+
+        for seat in seats:
+            player = row[seat]
+            q_a = q[player]
+            delta = 0.0
+            for other in seats:
+                if other != seat:
+                    margin = score[seat] - score[other]
+                    actual = 1.0 if margin > 0 else 0.0 if margin < 0 else 0.5
+                    delta += actual - q_a / (q_a + q[row[other]])
+
+            k = elo.find_k(ratings[player], k_table) // opponents
+            rated[seat] = ratings[player] + k * delta
+
+        for seat in seats:
+            ratings[row[seat]] = rated[seat]
+            q[row[seat]] = 10 ** (rated[seat] / 400)
+        after.append(rated)
+
+    return after
+
+
+def replay(log, starting_elo=STARTING_ELO, k_table=elo.K_FACTORS):
+    '''
+    Rates every game in *log*, in order, and returns a Replay.
+    '''
+    ratings = np.full(len(log.names), float(starting_elo))
+    after = np.full(log.players.shape, np.nan)
+
+    waves = log.waves()
+    if len(log) < MIN_WAVE * (waves.max() + 1 if len(waves) else 0):
+        ratings = ratings.tolist()
+        after = rate_games(ratings, log.players.tolist(),
+                           log.scores.tolist(), k_table)
+
+        return Replay(log, np.array(ratings),
+                      np.array(after, dtype=float).reshape(
+                          log.players.shape))
+
+    order = np.argsort(waves, kind='mergesort')
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+
+    for games in np.split(order, bounds):
+        if not len(games):
+            continue
+
+        players = log.players[games]
+        rated = rate(ratings, players, log.scores[games], k_table)
+
+        seated = players >= 0
+        ratings[players[seated]] = rated[seated]
+        after[games] = rated
+
+    return Replay(log, ratings, after)
@@ -1,5 +1,5 @@
-import json
 import elo
+import results
 
 STARTING_ELO = 1200
 
@@ -17,36 +17,83 @@ def print_elos(elos):
     print '----------'
 
 
-def main(results_file, starting_elo=STARTING_ELO):
-    with open(results_file, 'rb') as f:
-        games = json.load(f)
+def main(results_file, starting_elo=STARTING_ELO, batch=False, store=None,
+         rebuild=False, simultaneous=False):
+    if store:
+        return incremental(results_file, store, starting_elo, rebuild,
+                           simultaneous)
 
-    players = {}
-    for game in games['games']:
-
-        results = []
-        for player in game:
-            if player == '_game':
-                continue
-            results.append((player, players.get(player, starting_elo),
-                            game[player]))
+    if batch:
+        # Only the final table, replayed in one go
+        import engine
 
-        adjusted = elo.game_results(players=results)
+        replay = engine.replay(engine.GameLog.load(results_file),
+                               starting_elo=starting_elo)
+        print_elos(replay.final())
+        return
 
-        for player in adjusted:
-            players[player.id] = player.rating
-
-        try:
-            print '{0: ^90}'.format(game['_game'])
-        except KeyError:
-            pass
-        print_elos(players)
+    players = {}
+    for game in elo.apply_games(results.read_games(results_file), players,
+                                starting_elo, simultaneous=simultaneous):
+        print_game(game, players)
+
+
+def incremental(results_file, path, starting_elo=STARTING_ELO,
+                rebuild=False, simultaneous=False):
+    # Only the games added since the last run are rated (and printed)
+    import store
+
+    ratings = store.RatingStore(path, starting_elo,
+                                simultaneous=simultaneous)
+    try:
+        if results_file.endswith(results.LINE_SUFFIXES):
+            # JSON lines can seek straight to the new games
+            with open(results_file, 'rb') as f:
+                update = ratings.rebuild_lines if rebuild else \
+                    ratings.update_lines
+                print_updates(update(f), ratings)
+        else:
+            update = ratings.rebuild if rebuild else ratings.update
+            print_updates(update(results.read_games(results_file)), ratings)
+    finally:
+        ratings.close()
+
+
+def print_updates(updates, ratings):
+    players = None
+    for game, players in updates:
+        print_game(game, players)
+
+    if players is None:
+        print_elos(ratings.ratings())
+
+
+def print_game(game, players):
+    try:
+        print '{0: ^90}'.format(game['_game'])
+    except KeyError:
+        pass
+    print_elos(players)
 
 if __name__ == '__main__':
     from argparse import ArgumentParser
 
     parser = ArgumentParser()
     parser.add_argument('results_file')
+    parser.add_argument('--batch', action='store_true', help='Replay every '
+                        'game at once with NumPy and print only the final '
+                        'ratings.  Implies --simultaneous.')
+    parser.add_argument('--simultaneous', action='store_true', help='Rate '
+                        'every pair in a game from the pre-game ratings '
+                        'instead of updating ratings pair by pair.')
+
+    parser.add_argument('--store', help='SQLite file holding the current '
+                        'ratings; only games added since the last run are '
+                        'rated.')
+    parser.add_argument('--rebuild', action='store_true', help='With --store, '
+                        're-rate the whole history (after changing the '
+                        'formula, say).')
 
     args = parser.parse_args()
-    main(args.results_file)
+    main(args.results_file, batch=args.batch, store=args.store,
+         rebuild=args.rebuild, simultaneous=args.simultaneous)
@@ -0,0 +1,190 @@
+'''
+Reads game results one game at a time, so memory use stays flat however
+long the history gets.
+
+Two formats are understood:
+
+* the original document, {"games": [{...}, {...}, ...]}, which is parsed
+  incrementally: only the game being decoded is ever held in memory;
+* JSON lines (.jsonl or .ndjson), one game object per line.
+
+To convert a document to JSON lines:
+
+    python rankings/results.py game_results.json game_results.jsonl
+'''
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 1 << 16
+LINE_SUFFIXES = ('.jsonl', '.ndjson')
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_COMMA = re.compile(r'[ \t\n\r]*,[ \t\n\r]*')
+
+
+class _Scanner(object):
+    # A window onto a file that JSON values can be decoded from one at a
+    # time, reading more of the file only when a value runs past the end
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = u''
+        self.offset = 0
+        self.decoder = json.JSONDecoder()
+        # Chunks can end part way through a UTF-8 character
+        self.text = codecs.getincrementaldecoder('utf-8')()
+        self.eof = False
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        chunk = self.text.decode(data, final=not data)
+        if not data:
+            self.eof = True
+            return False
+
+        # Drop what has been consumed before growing the buffer
+        self.buffer = self.buffer[self.offset:] + chunk
+        self.offset = 0
+        return True
+
+    def peek(self):
+        '''
+        The next non-whitespace character, or '' at the end of the file.
+        '''
+        while True:
+            self.offset = _WHITESPACE.match(self.buffer, self.offset).end()
+
+            if self.offset < len(self.buffer):
+                return self.buffer[self.offset]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expected {0!r} at {1!r}'.format(
+                char, self.buffer[self.offset:self.offset + 20]))
+        self.offset += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.offset)
+            except ValueError:
+                # Most likely cut off by the end of the buffer
+                if self._fill():
+                    continue
+                raise
+
+            # A number could carry on past the end of the buffer
+            if end == len(self.buffer) and not self.eof and self._fill():
+                continue
+
+            self.offset = end
+            return value
+
+    def items(self):
+        '''
+        Yields each value of the array whose '[' comes next.
+        '''
+        self.expect('[')
+        if self.peek() == ']':
+            self.offset += 1
+            return
+
+        while True:
+            yield self.value()
+
+            # The usual case, a comma and the next item already buffered
+            match = _COMMA.match(self.buffer, self.offset)
+            if match and match.end() < len(self.buffer):
+                self.offset = match.end()
+                continue
+
+            if self.peek() == ',':
+                self.offset += 1
+            else:
+                self.expect(']')
+                return
+
+
+def iter_document(f, key='games', chunk_size=CHUNK_SIZE):
+    '''
+    Yields the items of the *key* array in a {"games": [...]} document read
+    from the open file *f*, one at a time.  Other top level keys are
+    skipped.
+    '''
+    scanner = _Scanner(f, chunk_size)
+    scanner.expect('{')
+
+    while scanner.peek() != '}':
+        name = scanner.value()
+        scanner.expect(':')
+
+        if name != key:
+            scanner.value()
+        else:
+            for item in scanner.items():
+                yield item
+
+        if scanner.peek() == ',':
+            scanner.expect(',')
+
+
+def iter_lines(f):
+    '''
+    Yields the game on each non-blank line of the open file *f*.
+    '''
+    for game, _ in iter_line_offsets(f):
+        yield game
+
+
+def iter_line_offsets(f):
+    '''
+    Like iter_lines, but yields (game, offset) pairs where *offset* is the
+    byte offset its line starts at, so a reader can seek back to it.
+    '''
+    while True:
+        # readline, not iteration, so tell() stays accurate
+        offset = f.tell()
+        line = f.readline()
+        if not line:
+            return
+
+        line = line.strip()
+        if line:
+            yield json.loads(line), offset
+
+
+def read_games(results_file):
+    '''
+    Yields every game in *results_file*, in order, choosing the format by
+    its extension.
+    '''
+    with open(results_file, 'rb') as f:
+        if results_file.endswith(LINE_SUFFIXES):
+            games = iter_lines(f)
+        else:
+            games = iter_document(f)
+
+        for game in games:
+            yield game
+
+
+def write_lines(games, f):
+    for game in games:
+        f.write(json.dumps(game, sort_keys=True) + '\n')
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Converts game results to JSON '
+                            'lines.')
+    parser.add_argument('results_file')
+    parser.add_argument('output_file')
+
+    args = parser.parse_args()
+    with open(args.output_file, 'wb') as f:
+        write_lines(read_games(args.results_file), f)
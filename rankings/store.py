@@ -0,0 +1,173 @@
+'''
+Current ratings kept in SQLite, so new games are rated on top of the last
+run instead of replaying the whole history.
+
+The store remembers how many games it has applied (the high-water mark), a
+fingerprint of the last of them, and the formula the ratings were made
+with.  Results are expected to be append-only: if the game at the mark no
+longer matches, or the formula changed, update() refuses and a rebuild()
+from the full history is needed.
+
+Finding the mark in a document means decoding every game before it.  For
+JSON lines, update_lines() and rebuild_lines() also remember the byte
+offset of the last applied game's line, so the next update seeks straight
+to it and only reads what is new.
+'''
+import hashlib
+import json
+import sqlite3
+
+import elo
+import results
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS ratings (
+    player TEXT PRIMARY KEY,
+    rating REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class StaleStore(Exception):
+    pass
+
+
+def fingerprint(game):
+    return hashlib.sha1(json.dumps(game, sort_keys=True)).hexdigest()
+
+
+class RatingStore(object):
+    def __init__(self, path, starting_elo, k_factors=elo.K_FACTORS,
+                 simultaneous=False):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+        self.starting_elo = starting_elo
+        self.k_factors = k_factors
+        self.simultaneous = simultaneous
+        self.formula = json.dumps([starting_elo, k_factors, simultaneous])
+
+    def close(self):
+        self.db.close()
+
+    def _meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?',
+                              (key,)).fetchone()
+        return default if row is None else row[0]
+
+    @property
+    def applied(self):
+        '''
+        How many games from the start of the results the ratings include.
+        '''
+        return int(self._meta('applied', 0))
+
+    def ratings(self):
+        return dict(self.db.execute('SELECT player, rating FROM ratings'))
+
+    def _check(self, applied, last):
+        # *last* is the game the results have at the high-water mark
+        if applied and self._meta('formula') != self.formula:
+            raise StaleStore('The rating formula changed; rebuild the store')
+
+        if applied and (last is None or
+                        fingerprint(last) != self._meta('last')):
+            raise StaleStore('The results no longer match the store; '
+                             'rebuild it')
+
+    def update(self, games):
+        '''
+        Rates whatever games in *games* (the full, append-only history) come
+        after the high-water mark, yielding each as it is applied along with
+        the current ratings.  Everything is committed once the last new game
+        is rated.
+        '''
+        applied = self.applied
+
+        games = iter(games)
+        last = None
+        for _ in xrange(applied):
+            last = next(games, None)
+
+        self._check(applied, last)
+        return self._apply(games, self.ratings(), applied)
+
+    def update_lines(self, f):
+        '''
+        Like update, for the open JSON lines file *f*: seeks to the last
+        applied game instead of decoding everything before it.
+        '''
+        applied = self.applied
+        offset = self._meta('offset')
+
+        last = None
+        if offset is not None:
+            f.seek(int(offset))
+            lines = results.iter_line_offsets(f)
+            if applied:
+                last, _ = next(lines, (None, None))
+        else:
+            # Built from a document: find the mark the slow way once
+            lines = results.iter_line_offsets(f)
+            for _ in xrange(applied):
+                last, _ = next(lines, (None, None))
+
+        self._check(applied, last)
+        return self._apply_lines(lines, self.ratings(), applied)
+
+    def rebuild(self, games):
+        '''
+        Throws the stored ratings away and rates *games* from scratch.
+        '''
+        self._clear()
+        return self._apply(iter(games), {}, 0)
+
+    def rebuild_lines(self, f):
+        '''
+        Like rebuild, for the open JSON lines file *f*.
+        '''
+        self._clear()
+        return self._apply_lines(results.iter_line_offsets(f), {}, 0)
+
+    def _clear(self):
+        with self.db:
+            self.db.execute('DELETE FROM ratings')
+            self.db.execute('DELETE FROM meta')
+
+    def _apply_lines(self, lines, ratings, applied):
+        # Remembers where the last applied game's line starts
+        meta = {}
+
+        def games():
+            for game, offset in lines:
+                meta['offset'] = str(offset)
+                yield game
+
+        return self._apply(games(), ratings, applied, meta)
+
+    def _apply(self, games, ratings, applied, meta=None):
+        last = None
+        for game in elo.apply_games(games, ratings, self.starting_elo,
+                                    self.k_factors, self.simultaneous):
+            applied += 1
+            last = game
+            yield game, ratings
+
+        if last is None:
+            return
+
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO ratings (player, rating) '
+                'VALUES (?, ?)', ratings.iteritems())
+            self.db.executemany(
+                'INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)',
+                [('applied', str(applied)), ('last', fingerprint(last)),
+                 ('formula', self.formula)] + sorted((meta or {}).items()))
+
+            if meta is None:
+                # A document has no offsets; drop any left from lines
+                self.db.execute("DELETE FROM meta WHERE key = 'offset'")
@@ -0,0 +1,51 @@
+import itertools
+import unittest
+
+import numpy as np
+
+import elo
+import engine
+
+GAME = [('a', 1300, 5), ('b', 1200, 3), ('c', 1250, 3), ('d', 1100, 1)]
+
+
+def ratings(results):
+    return dict((player.id, player.rating) for player in results)
+
+
+class TestSimultaneous(unittest.TestCase):
+    def test_order_independent(self):
+        expected = ratings(elo.game_results(GAME, simultaneous=True))
+
+        for order in itertools.permutations(GAME):
+            actual = ratings(elo.game_results(list(order),
+                                              simultaneous=True))
+            for name in expected:
+                self.assertAlmostEqual(actual[name], expected[name])
+
+    def test_zero_sum(self):
+        # Everyone has the same K, so what one player gains another loses
+        results = ratings(elo.game_results(GAME, simultaneous=True))
+        self.assertAlmostEqual(sum(results.values()),
+                               sum(rating for _, rating, _ in GAME))
+
+    def test_two_players(self):
+        game = [('a', 1300, 1), ('b', 1200, 2)]
+        self.assertEquals(ratings(elo.game_results(game)),
+                          ratings(elo.game_results(game, simultaneous=True)))
+
+    def test_matches_engine(self):
+        names = [name for name, _, _ in GAME]
+        rated = engine.rate(
+            np.array([rating for _, rating, _ in GAME], dtype=float),
+            np.array([range(len(GAME))]),
+            np.array([[score for _, _, score in GAME]], dtype=float))[0]
+
+        results = ratings(elo.game_results(GAME, simultaneous=True))
+        for name, rating in zip(names, rated):
+            self.assertAlmostEqual(results[name], rating)
+
+    def test_single_player(self):
+        self.assertEquals(
+            ratings(elo.game_results([('a', 1200, 1)], simultaneous=True)),
+            {'a': 1200})
@@ -0,0 +1,83 @@
+import random
+import unittest
+
+import numpy as np
+
+import elo
+import engine
+
+
+class TestEngine(unittest.TestCase):
+    def test_log(self):
+        log = engine.GameLog.from_games([
+            {'a': 1, 'b': 2, '_game': 'first'},
+            {'c': 3, 'a': 1, 'b': 0},
+        ])
+
+        self.assertEquals(sorted(log.names), ['a', 'b', 'c'])
+        self.assertEquals(log.players.shape, (2, 3))
+        self.assertEquals(log.players[0, 2], -1)
+        self.assertEquals(log.labels, ['first', None])
+        self.assertEquals(list(log.waves()), [0, 1])
+
+    def test_two_players(self):
+        # With two players there is no order dependence, so the engine
+        # agrees with game_results exactly
+        rng = random.Random(1)
+        names = ['p{0}'.format(i) for i in xrange(8)]
+        games = []
+        for _ in xrange(200):
+            first, second = rng.sample(names, 2)
+            games.append({first: rng.randint(0, 2),
+                          second: rng.randint(0, 2)})
+
+        ratings = {}
+        for game in games:
+            for player in elo.game_results(players=[
+                    (name, ratings.get(name, 1200), score)
+                    for name, score in game.iteritems()]):
+                ratings[player.id] = player.rating
+
+        final = engine.replay(engine.GameLog.from_games(games)).final()
+        for name in ratings:
+            self.assertAlmostEqual(final[name], ratings[name])
+
+    def test_narrow_waves(self):
+        # A few regulars make one game waves, which go game by game; both
+        # ways of replaying give the same ratings
+        rng = random.Random(2)
+        names = ['p{0}'.format(i) for i in xrange(6)]
+        log = engine.GameLog.from_games(
+            [dict((name, rng.randint(0, 5))
+                  for name in rng.sample(names, rng.randint(2, 4)))
+             for _ in xrange(300)])
+
+        looped = engine.replay(log)
+        minimum = engine.MIN_WAVE
+        engine.MIN_WAVE = 0
+        try:
+            waved = engine.replay(log)
+        finally:
+            engine.MIN_WAVE = minimum
+
+        self.assertTrue(np.allclose(looped.ratings, waved.ratings))
+        self.assertTrue(np.allclose(looped.after, waved.after,
+                                    equal_nan=True))
+        self.assertTrue(np.isnan(looped.after[log.players < 0]).all())
+
+    def test_multiplayer(self):
+        replay = engine.replay(engine.GameLog.from_games([
+            {'a': 3, 'b': 2, 'c': 1},
+            {'a': 1, 'b': 2},
+        ]))
+
+        # Everyone starts equal, so each pair moves K / 2 / 2 = 8 points
+        trajectory = replay.trajectory('a')
+        self.assertEquals(trajectory[0], 1216)
+        self.assertTrue(trajectory[1] < 1200)
+        self.assertEquals(replay.final()['c'], 1184)
+        self.assertAlmostEqual(sum(replay.final().values()), 3600)
+
+    def test_k_factors(self):
+        k = engine.k_factors(np.array([[2000.0, 2200, 2500]]), np.array([2]))
+        self.assertEquals(list(k[0]), [32, 24, 16])
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from StringIO import StringIO
+import json
+import os
+import unittest
+
+import results
+
+RESULTS_FILE = os.path.join(os.path.dirname(__file__), 'game_results.json')
+
+
+class TestResults(unittest.TestCase):
+    def test_document(self):
+        with open(RESULTS_FILE, 'rb') as f:
+            expected = json.load(f)['games']
+
+        # Tiny chunks make every value straddle a chunk boundary
+        for chunk_size in (1, 7, 4096):
+            with open(RESULTS_FILE, 'rb') as f:
+                games = list(results.iter_document(f, chunk_size=chunk_size))
+            self.assertEquals(games, expected)
+
+    def test_other_keys(self):
+        document = StringIO(
+            '{"version": {"major": [1, 2]}, "games": [{"a": 1.5e2}],'
+            ' "note": "done"}')
+        self.assertEquals(list(results.iter_document(document, chunk_size=3)),
+                          [{'a': 150.0}])
+
+        self.assertEquals(
+            list(results.iter_document(StringIO('{"games": []}'))), [])
+
+    def test_unicode(self):
+        document = StringIO(json.dumps(
+            {'games': [{u'Jos\xe9': 1, u'张': 2}]}, ensure_ascii=False
+        ).encode('utf-8'))
+
+        games = list(results.iter_document(document, chunk_size=2))
+        self.assertEquals(games, [{u'Jos\xe9': 1, u'张': 2}])
+
+    def test_lines(self):
+        games = [{'a': 1, 'b': 2}, {'c': 3, '_game': 'second'}]
+        output = StringIO()
+        results.write_lines(games, output)
+
+        lines = StringIO(output.getvalue() + '\n')
+        self.assertEquals(list(results.iter_lines(lines)), games)
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(results.iter_document(StringIO('{"games": [{"a": 1}, {"b'),
+                                       chunk_size=4))
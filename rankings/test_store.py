@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import elo
+import results
+import store
+
+GAMES = [
+    {'a': 3, 'b': 2, 'c': 1},
+    {'a': 1, 'b': 2},
+    {'b': 1, 'c': 2, '_game': 'third'},
+]
+
+
+def replay(games):
+    ratings = {}
+    for _ in elo.apply_games(games, ratings, 1200):
+        pass
+
+    return ratings
+
+
+class TestRatingStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'ratings.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_update(self, games, rebuild=False, **options):
+        ratings = store.RatingStore(self.path, 1200, **options)
+        try:
+            update = ratings.rebuild if rebuild else ratings.update
+            applied = [game for game, _ in update(games)]
+            return applied, ratings.ratings(), ratings.applied
+        finally:
+            ratings.close()
+
+    def test_incremental(self):
+        applied, _, count = self.run_update(GAMES[:2])
+        self.assertEquals(len(applied), 2)
+        self.assertEquals(count, 2)
+
+        applied, ratings, count = self.run_update(GAMES)
+        self.assertEquals(applied, GAMES[2:])
+        self.assertEquals(count, 3)
+
+        expected = replay(GAMES)
+        for name in expected:
+            self.assertAlmostEqual(ratings[name], expected[name])
+
+        # Nothing new, nothing changes
+        applied, again, _ = self.run_update(GAMES)
+        self.assertEquals(applied, [])
+        self.assertEquals(again, ratings)
+
+    def test_stale(self):
+        self.run_update(GAMES[:2])
+
+        with self.assertRaises(store.StaleStore):
+            self.run_update([GAMES[0], {'a': 5, 'b': 1}] + GAMES[2:])
+
+        with self.assertRaises(store.StaleStore):
+            self.run_update(GAMES, k_factors=[(None, 10)])
+
+        applied, ratings, count = self.run_update(
+            GAMES, rebuild=True, k_factors=[(None, 10)])
+        self.assertEquals(count, 3)
+        self.assertEquals(len(applied), 3)
+        # Rated with the new K, not the default one
+        self.assertNotAlmostEqual(ratings['a'], replay(GAMES)['a'])
+
+    def run_lines(self, games, rebuild=False):
+        lines = os.path.join(self.directory, 'results.jsonl')
+        with open(lines, 'wb') as f:
+            results.write_lines(games, f)
+
+        ratings = store.RatingStore(self.path, 1200)
+        try:
+            with open(lines, 'rb') as f:
+                update = ratings.rebuild_lines if rebuild else \
+                    ratings.update_lines
+                applied = [game for game, _ in update(f)]
+            return applied, ratings.ratings(), ratings.applied
+        finally:
+            ratings.close()
+
+    def test_lines(self):
+        applied, _, count = self.run_lines(GAMES[:2])
+        self.assertEquals((len(applied), count), (2, 2))
+
+        applied, ratings, count = self.run_lines(GAMES)
+        self.assertEquals(applied, GAMES[2:])
+        self.assertEquals(count, 3)
+
+        expected = replay(GAMES)
+        for name in expected:
+            self.assertAlmostEqual(ratings[name], expected[name])
+
+        # Seeking to the mark finds a changed game there
+        with self.assertRaises(store.StaleStore):
+            self.run_lines(GAMES[:2] + [{'b': 9, 'c': 2}])
+
+        # A store built from a document finds its mark by counting once
+        self.run_update(GAMES[:2], rebuild=True)
+        applied, _, count = self.run_lines(GAMES)
+        self.assertEquals((applied, count), (GAMES[2:], 3))
+
+        applied, _, count = self.run_lines(GAMES + GAMES[:1])
+        self.assertEquals((applied, count), (GAMES[:1], 4))
+
+    def test_lines_seek(self):
+        self.run_lines(GAMES[:2])
+
+        # Only the last applied game is read back, not the whole history:
+        # the games before it can be anything at all
+        lines = os.path.join(self.directory, 'results.jsonl')
+        with open(lines, 'rb') as f:
+            first = len(f.readline())
+        with open(lines, 'r+b') as f:
+            f.write('x' * (first - 1))
+            f.seek(0, os.SEEK_END)
+            results.write_lines(GAMES[2:], f)
+
+        ratings = store.RatingStore(self.path, 1200)
+        try:
+            with open(lines, 'rb') as f:
+                applied = [game for game, _ in ratings.update_lines(f)]
+        finally:
+            ratings.close()
+
+        self.assertEquals(applied, GAMES[2:])
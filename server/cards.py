@@ -2,11 +2,32 @@ class InvalidActivity(Exception):
     pass
 
 
+# Card types as bit flags, so type checks are an integer AND
+TYPES = ('Action', 'Treasure', 'Victory', 'Attack', 'Reaction', 'Duration')
+ACTION, TREASURE, VICTORY, ATTACK, REACTION, DURATION = (
+    1 << i for i in xrange(len(TYPES)))
+
+
+def type_flags(types):
+    flags = 0
+    for type in types:
+        flags |= 1 << TYPES.index(type)
+
+    return flags
+
+
 class BaseCard(object):
+    # Cards that keep state between play() and respond() get a fresh
+    # instance per play; every other card is shared (see get)
+    stateful = False
+    flags = 0
+    # The name the card was looked up by (several names share a class)
+    name = None
     _gold = 0
     _actions = 0
     _buys = 0
     _cost = 0
+    _victory = 0
     _size = 10
     type = []
 
@@ -34,6 +55,10 @@ class BaseCard(object):
     def resume(self):
         return False
 
+    def restore(self, game):
+        # Picks up a play of this card left waiting in a snapshot of *game*
+        self.game = game
+
 
 class AttackCard(BaseCard):
     def resume(self):
@@ -102,7 +127,7 @@ class Adventurer(BaseCard):
             except IndexError:
                 break
 
-            if 'Treasure' in get(revealed).type:
+            if lookup(revealed).flags & TREASURE:
                 treasures.append(revealed)
             else:
                 revealed_cards.append(revealed)
@@ -113,6 +138,7 @@ class Adventurer(BaseCard):
 
 class Bureaucrat(AttackCard):
     type = ['Action', 'Attack']
+    stateful = True
     _cost = 4
 
     def play(self, game):
@@ -123,8 +149,15 @@ class Bureaucrat(AttackCard):
         # There will always be a next!
         self.iterator.next()
 
-    def _attack(self):
-        for player in self.game.player_turns[1:]:
+    def restore(self, game):
+        # Carry on from whichever player the game is waiting for
+        self.game = game
+        self.iterator = self._attack(
+            game.player_turns.index(game.wait[0]))
+        self.iterator.next()
+
+    def _attack(self, start=1):
+        for player in self.game.player_turns[start:]:
             self.game.wait_for(player, 'bureaucrat')
             yield
 
@@ -147,6 +180,7 @@ class Bureaucrat(AttackCard):
 
 class Cellar(BaseCard):
     type = ['Action']
+    stateful = True
 
     _actions = 1
     _cost = 2
@@ -168,6 +202,7 @@ class Cellar(BaseCard):
 
 class Chancellor(BaseCard):
     type = ['Action']
+    stateful = True
     _cost = 3
     _gold = 2
 
@@ -187,6 +222,7 @@ class Chancellor(BaseCard):
 
 class Chapel(BaseCard):
     type = ['Action']
+    stateful = True
     _cost = 2
 
     def play(self, game):
@@ -224,6 +260,7 @@ class CouncilRoom(BaseCard):
 
 class Feast(BaseCard):
     type = ['Action']
+    stateful = True
     _cost = 4
 
     def play(self, game):
@@ -239,7 +276,7 @@ class Feast(BaseCard):
 
         card = commands[1]
 
-        if get(card).cost(self.game) <= 5:
+        if lookup(card).cost(self.game) <= 5:
             self.game.gain(player, card)
         else:
             raise InvalidActivity('The card you selected is worth more than 5')
@@ -278,12 +315,53 @@ def card_aggregator(type):
     return [name for name, value in CARDS.iteritems()
             if type in value.type]
 
+# Stand-ins that are only Copper under another name until implemented
+PLACEHOLDER_CARDS = frozenset(name for name, card in CARDS.iteritems()
+                              if card is Copper and name != 'copper')
+
 VICTORY_CARDS = card_aggregator('Victory')
-TREASURE_CARDS = card_aggregator('Treasure')
+# A set, since it is checked against every card in hand each turn
+TREASURE_CARDS = frozenset(card_aggregator('Treasure'))
 REACTION_CARDS = card_aggregator('Reaction')
 ATTACK_CARDS = card_aggregator('Attack')
 DURATION_CARDS = card_aggregator('Duration')
 
 
+def _set_flags(classes):
+    # In a function so the loop variable doesn't become a module attribute
+    for card in classes:
+        card.flags = type_flags(card.type)
+
+
+_set_flags(set(CARDS.itervalues()))
+
+
+def _create(card_name):
+    card = CARDS[card_name]()
+    card.name = card_name
+    return card
+
+# One instance of every card, for reading costs, types and the like
+_PROTOTYPES = dict((name, _create(name)) for name in CARDS)
+
+_SHARED = dict((name, card) for name, card in _PROTOTYPES.iteritems()
+               if not card.stateful)
+
+
 def get(card_name):
-    return CARDS[card_name]()
+    '''
+    The card to play as *card_name*.  Stateless cards are shared instances;
+    stateful ones are created per play.
+    '''
+    try:
+        return _SHARED[card_name]
+    except KeyError:
+        return _create(card_name)
+
+
+def lookup(card_name):
+    '''
+    A shared instance of *card_name* for read-only questions (cost, type,
+    victory points).  Never play it.
+    '''
+    return _PROTOTYPES[card_name]
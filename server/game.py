@@ -1,6 +1,56 @@
-from .player import Player
+from array import array
+import random
+import struct
+
+from .player import Player, Zone, CARD_NAMES, card_id, card_ids
 from . import cards
 
+_TREASURE_IDS = card_ids(cards.TREASURE_CARDS)
+
+SNAPSHOT_MAGIC = 'DOMG'
+SNAPSHOT_VERSION = 1
+PHASES = ('Action', 'Treasure', 'Buy')
+# Card id meaning "no card" in a snapshot
+_NO_CARD = 0xff
+
+_HEADER = struct.Struct('<4sBB')
+_GAME = struct.Struct('<IBBBB')
+_PLAYER = struct.Struct('<hhh')
+_SUPPLY = struct.Struct('<BH')
+
+
+def _pack_string(parts, string):
+    string = string.encode('utf-8')
+    parts.append(struct.pack('<H', len(string)))
+    parts.append(string)
+
+
+class _Reader(object):
+    # Walks a snapshot blob front to back
+    def __init__(self, blob):
+        self.blob = blob
+        self.offset = 0
+
+    def unpack(self, format):
+        return format.unpack(self.read(format.size))
+
+    def read(self, size):
+        data = self.blob[self.offset:self.offset + size]
+        if len(data) != size:
+            raise ValueError('Truncated snapshot')
+
+        self.offset += size
+        return data
+
+    def string(self):
+        size, = struct.unpack('<H', self.read(2))
+        return self.read(size).decode('utf-8')
+
+    def ids(self, table):
+        # Card ids in the blob, translated to this process' interned ids
+        size, = struct.unpack('<H', self.read(2))
+        return array('B', self.read(size).translate(table))
+
 
 class NotYourTurn(Exception):
     pass
@@ -10,8 +60,26 @@ class NoRemainingActions(Exception):
     pass
 
 
+class NoRemainingBuys(Exception):
+    pass
+
+
+class NotEnoughGold(Exception):
+    pass
+
+
+class EmptySupply(Exception):
+    pass
+
+
 class Game(object):
-    def __init__(self, players, cards_in_supply):
+    def __init__(self, players, cards_in_supply, rng=None):
+        # *rng* may be a seed or a random.Random; every shuffle in the game
+        # is drawn from it so a seeded game can be replayed exactly.
+        if rng is None or isinstance(rng, (int, long)):
+            rng = random.Random(rng)
+
+        self.rng = rng
         self.player_order = players
         self.players = {}
         self.active_card = None
@@ -21,16 +89,252 @@ class Game(object):
 
         for player in players:
             self.players[player] = Player(initial_cards=[
-                'estate'] * 3 + ['copper'] * 7)
+                'estate'] * 3 + ['copper'] * 7, rng=self.rng)
 
         self.cards = cards_in_supply
         self.supply = {}
         for card in cards_in_supply:
-            self.supply[card] = cards.get(card).size(self)
+            self.supply[card] = cards.lookup(card).size(self)
         self.turn_index = 0
 
+    def snapshot(self, include_rng=True):
+        '''
+        Packs the whole game into a compact, versioned binary blob that
+        restore() turns back into a Game, here or in another process.
+        Leave out the random state with *include_rng* when the restored game
+        should shuffle differently (for lookahead, say).
+        '''
+        active = self.active_card
+        wait = self.wait
+        zones = [Zone(self.trash).ids]
+        for name in self.player_order:
+            player = self.players[name]
+            zones.extend(zone.ids for zone in (
+                player.deck, player.hand, player.in_play,
+                player.discard_pile))
+
+        # Card ids are only meaningful inside one process, so the blob
+        # numbers the cards it uses itself and carries their names
+        used = set(card_id(card) for card in self.cards)
+        for ids in zones:
+            used.update(ids)
+        if active is not None:
+            used.add(card_id(active.name))
+        if wait:
+            used.add(card_id(wait[1]))
+
+        used = sorted(used)
+        local = dict((i, n) for n, i in enumerate(used))
+        table = bytearray(256)
+        for i, n in local.iteritems():
+            table[i] = n
+        table = str(table)
+
+        parts = [_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION,
+                              len(self.player_order))]
+        parts.append(struct.pack('<B', len(used)))
+        for i in used:
+            _pack_string(parts, CARD_NAMES[i])
+
+        for name in self.player_order:
+            _pack_string(parts, name)
+
+        parts.append(_GAME.pack(
+            self.turn_index, PHASES.index(self.phase),
+            len(self.cards),
+            _NO_CARD if active is None else local[card_id(active.name)],
+            self.player_order.index(wait[0]) if wait else _NO_CARD))
+
+        if wait:
+            parts.append(struct.pack('<B', local[card_id(wait[1])]))
+
+        for card in self.cards:
+            parts.append(_SUPPLY.pack(local[card_id(card)],
+                                      self.supply[card]))
+
+        def pack_ids(ids):
+            parts.append(struct.pack('<H', len(ids)))
+            parts.append(ids.tostring().translate(table))
+
+        pack_ids(zones[0])
+        for n, name in enumerate(self.player_order):
+            player = self.players[name]
+            parts.append(_PLAYER.pack(player.gold, player.actions,
+                                      player.buys))
+            for ids in zones[1 + 4 * n:5 + 4 * n]:
+                pack_ids(ids)
+
+        if include_rng:
+            version, state, gauss = self.rng.getstate()
+            parts.append(struct.pack('<BB', 1, version))
+            parts.append(array('I', state).tostring())
+            parts.append(struct.pack('<d', gauss if gauss is not None
+                                     else float('nan')))
+        else:
+            parts.append(struct.pack('<B', 0))
+
+        return ''.join(parts)
+
+    @classmethod
+    def restore(cls, blob, rng=None):
+        '''
+        Rebuilds the Game packed by snapshot().  *rng* (a seed or a
+        random.Random) replaces the saved random state, and is required if
+        the snapshot has none.
+        '''
+        reader = _Reader(blob)
+        magic, version, player_count = reader.unpack(_HEADER)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError('Not a game snapshot')
+        if version != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported snapshot version {0}'.format(
+                version))
+
+        name_count, = struct.unpack('<B', reader.read(1))
+        names = [card_id(reader.string()) for _ in xrange(name_count)]
+        table = str(bytearray(names + [0] * (256 - len(names))))
+
+        game = cls.__new__(cls)
+        game.player_order = [reader.string() for _ in xrange(player_count)]
+        (game.turn_index, phase, supply_count, active,
+         waiting) = reader.unpack(_GAME)
+        game.phase = PHASES[phase]
+
+        wait_card = None
+        if waiting != _NO_CARD:
+            wait_card = CARD_NAMES[names[ord(reader.read(1))]]
+
+        game.cards = []
+        game.supply = {}
+        for _ in xrange(supply_count):
+            card, count = reader.unpack(_SUPPLY)
+            card = CARD_NAMES[names[card]]
+            game.cards.append(card)
+            game.supply[card] = count
+
+        game.trash = [CARD_NAMES[i] for i in reader.ids(table)]
+
+        game.players = {}
+        for name in game.player_order:
+            player = Player.__new__(Player)
+            player.gold, player.actions, player.buys = reader.unpack(_PLAYER)
+            for attribute in ('_deck', '_hand', '_in_play', '_discard_pile'):
+                zone = Zone()
+                zone.ids = reader.ids(table)
+                setattr(player, attribute, zone)
+            game.players[name] = player
+
+        has_rng, = struct.unpack('<B', reader.read(1))
+        if rng is None:
+            if not has_rng:
+                raise ValueError('The snapshot has no random state; pass rng')
+
+            rng_version, = struct.unpack('<B', reader.read(1))
+            state = array('I')
+            state.fromstring(reader.read(625 * state.itemsize))
+            gauss, = struct.unpack('<d', reader.read(8))
+            rng = random.Random()
+            rng.setstate((rng_version, tuple(state),
+                          None if gauss != gauss else gauss))
+        elif isinstance(rng, (int, long)):
+            rng = random.Random(rng)
+
+        game.rng = rng
+        for player in game.players.itervalues():
+            player.rng = rng
+
+        game.wait = None
+        game.active_card = None
+        if waiting != _NO_CARD:
+            game.wait = (game.player_order[waiting], wait_card)
+        if active != _NO_CARD:
+            game.active_card = cards.get(CARD_NAMES[names[active]])
+            if game.wait and game.active_card.stateful:
+                game.active_card.restore(game)
+
+        return game
+
+    def fork(self, rng=None):
+        '''
+        An independent copy of the game for lookahead.  Zones are byte
+        arrays, so copying them is a memcpy; the supply name list is shared
+        since nothing changes it.  The fork shuffles with *rng* (a seed or a
+        random.Random), by default one seeded from this game's rng, and gets
+        its own copy of any card waiting on a response.
+        '''
+        if rng is None:
+            rng = random.Random(self.rng.getrandbits(64))
+        elif isinstance(rng, (int, long)):
+            rng = random.Random(rng)
+
+        game = Game.__new__(Game)
+        game.rng = rng
+        game.player_order = self.player_order
+        game.players = dict((name, player.fork(rng))
+                            for name, player in self.players.iteritems())
+        game.phase = self.phase
+        game.trash = list(self.trash)
+        game.cards = self.cards
+        game.supply = dict(self.supply)
+        game.turn_index = self.turn_index
+        game.wait = self.wait
+
+        game.active_card = self.active_card
+        if self.wait and self.active_card.stateful:
+            game.active_card = cards.get(self.active_card.name)
+            game.active_card.restore(game)
+
+        return game
+
     def gain(self, player, card):
-        pass
+        if not self.supply.get(card):
+            raise EmptySupply('There are no {0} cards left.'.format(card))
+
+        self.supply[card] -= 1
+        self.players[player].add(card)
+
+    def buy(self, card_name, player=None):
+        if not player:
+            player = self.player_name
+
+        if player != self.player_name:
+            raise NotYourTurn("Please wait your turn.  It is {0}'s "
+                              "turn".format(self.player_name))
+
+        if self.wait:
+            raise Exception("Waiting for {0} to respond to {1}".format(
+                *self.wait))
+
+        buyer = self.players[player]
+        if buyer.buys <= 0:
+            raise NoRemainingBuys('You have run out of buys.')
+
+        cost = cards.lookup(card_name).cost(self)
+        if cost > buyer.gold:
+            raise NotEnoughGold('{0} costs {1}, you have {2}.'.format(
+                card_name, cost, buyer.gold))
+
+        self.gain(player, card_name)
+        self.phase = 'Buy'
+        buyer.gold -= cost
+        buyer.buys -= 1
+
+    def is_over(self):
+        # The provinces ran out, or any three supply piles did
+        if self.supply.get('province', 1) == 0:
+            return True
+
+        return sum(1 for count in self.supply.itervalues() if not count) >= 3
+
+    def scores(self):
+        # One victory() call per distinct card rather than per copy
+        scores = {}
+        for name, player in self.players.iteritems():
+            scores[name] = sum(
+                cards.lookup(CARD_NAMES[i]).victory(self) * count
+                for i, count in enumerate(player.counts()) if count)
+
+        return scores
 
     def next(self):
         self.player.cleanup()
@@ -58,25 +362,53 @@ class Game(object):
 
         card = cards.get(card_name)
 
-        if 'Action' in card.type:
+        if card.flags & cards.ACTION:
             if player.actions <= 0:
                 raise NoRemainingActions('You have run out of actions.')
             elif self.phase != 'Action':
                 raise Exception('You are in the treasure phase')
             else:
                 self.player.actions -= 1
-        elif 'Treasure' in card.type:
+        elif card.flags & cards.TREASURE:
             self.phase = 'Treasure'
 
         player.play(card_name)
 
         player.gold += card.gold(self)
         player.actions += card.actions(self)
+        player.buys += card.buys(self)
 
         self.active_card = card
 
         card.play(self)
 
+    def play_treasures(self):
+        '''
+        Plays every treasure in the current player's hand in a single pass,
+        rather than one play() (and one hand scan) per card.
+        '''
+        if self.wait:
+            raise Exception("Waiting for {0} to respond to {1}".format(
+                *self.wait))
+
+        player = self.player
+        treasures = player.hand.take(_TREASURE_IDS)
+
+        if not treasures:
+            return
+
+        player.in_play.ids.extend(treasures)
+        self.phase = 'Treasure'
+
+        for i in treasures:
+            card = cards.get(CARD_NAMES[i])
+            player.gold += card.gold(self)
+            player.actions += card.actions(self)
+            player.buys += card.buys(self)
+
+            self.active_card = card
+            card.play(self)
+
     def respond(self, commands, player):
         if player != self.wait[0]:
             raise NotYourTurn('Waiting on {0}'.format(self.wait[0]))
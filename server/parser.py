@@ -1,3 +1,6 @@
+from .game import NotYourTurn
+
+
 
 class InvalidPlayer(Exception):
     pass
@@ -20,8 +23,16 @@ class Parser(object):
 
         commands = command.split()
 
+        # Only whoever's turn it is may play cards or end the turn
+        if commands[0] in ('play', 'done') and \
+                player != self.game.player_name:
+            raise NotYourTurn("Please wait your turn.  It is {0}'s "
+                              "turn".format(self.game.player_name))
+
         if commands[0] == 'play':
             self.game.play(commands[1], player=player)
+        elif commands[0] == 'buy':
+            self.game.buy(commands[1], player=player)
         elif commands[0] == 'done':
             self.game.next()
         elif self.game.wait:
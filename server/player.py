@@ -1,4 +1,5 @@
-from collections import deque
+from array import array
+from itertools import imap
 import random
 
 
@@ -6,86 +7,266 @@ class CardNotInHand(Exception):
     pass
 
 
+# Card names are interned to small integers the first time they are seen, so
+# zones can hold one byte per card and compare cards as ints.
+CARD_NAMES = []
+CARD_IDS = {}
+
+
+def card_id(name):
+    try:
+        return CARD_IDS[name]
+    except KeyError:
+        if len(CARD_NAMES) > 255:
+            raise OverflowError('Too many distinct cards to intern')
+
+        CARD_IDS[name] = len(CARD_NAMES)
+        CARD_NAMES.append(name)
+        return CARD_IDS[name]
+
+
+def card_ids(names):
+    return frozenset(card_id(name) for name in names)
+
+
+class Zone(object):
+    '''
+    An ordered pile of cards stored as an array('B') of interned ids.  It
+    behaves like the list of card names it replaces, so cards and tests can
+    keep treating hand, deck and friends as lists of strings.
+    '''
+    __slots__ = ('ids',)
+
+    def __init__(self, cards=()):
+        if isinstance(cards, Zone):
+            self.ids = array('B', cards.ids)
+        else:
+            self.ids = array('B', [card_id(card) for card in cards])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return imap(CARD_NAMES.__getitem__, self.ids)
+
+    def __contains__(self, card):
+        return card in CARD_IDS and CARD_IDS[card] in self.ids
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [CARD_NAMES[i] for i in self.ids[index]]
+
+        return CARD_NAMES[self.ids[index]]
+
+    def __setitem__(self, index, card):
+        self.ids[index] = card_id(card)
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, card):
+        self.ids.append(card_id(card))
+
+    def extend(self, cards):
+        if isinstance(cards, Zone):
+            self.ids.extend(cards.ids)
+        else:
+            self.ids.extend(array('B', [card_id(card) for card in cards]))
+
+    def pop(self, index=-1):
+        return CARD_NAMES[self.ids.pop(index)]
+
+    def remove(self, card):
+        if card not in self:
+            raise ValueError('{0} is not in this zone'.format(card))
+
+        self.ids.remove(CARD_IDS[card])
+
+    def count(self, card):
+        if card not in CARD_IDS:
+            return 0
+
+        return self.ids.count(CARD_IDS[card])
+
+    def copy(self):
+        zone = Zone.__new__(Zone)
+        zone.ids = self.ids[:]
+        return zone
+
+    def take(self, wanted):
+        '''
+        Removes every card whose id is in *wanted*, keeping the rest in
+        order, and returns the removed ids.
+        '''
+        ids = self.ids
+        taken = array('B', [i for i in ids if i in wanted])
+
+        if taken:
+            self.ids = array('B', [i for i in ids if i not in wanted])
+
+        return taken
+
+    def clear(self):
+        del self.ids[:]
+
+
+def _zone(attribute):
+    # A Player attribute that turns anything assigned to it into a Zone
+    def get(self):
+        return getattr(self, attribute)
+
+    def set(self, cards):
+        setattr(self, attribute, Zone(cards))
+
+    return property(get, set)
+
+
 class Player(object):
-    def __init__(self, initial_cards=[]):
-        self.hand = []
-        self.deck = []
-        self.in_play = []
-        self.discard_pile = initial_cards
+    def __init__(self, initial_cards=[], rng=None):
+        # Shuffles come from here rather than the global random module;
+        # *rng* may be a seed or a random.Random, like Game's
+        if rng is None or isinstance(rng, (int, long)):
+            rng = random.Random(rng)
+        self.rng = rng
+        self._hand = Zone()
+        self._deck = Zone()
+        self._in_play = Zone()
+        self._discard_pile = Zone(initial_cards)
         self.draw(5)
         self.gold = 0
         self.actions = 1
+        self.buys = 1
+
+    hand = _zone('_hand')
+    deck = _zone('_deck')
+    in_play = _zone('_in_play')
+    discard_pile = _zone('_discard_pile')
 
     def add(self, card):
         self.discard_pile.append(card)
 
     def cleanup(self):
         # Discard your hand and draw a new hand
-        for card in self.hand[:]:
-            self.discard(card)
+        self._discard_pile.extend(self._hand)
+        self._hand.clear()
 
-        self.discard_pile.extend(self.in_play)
-        self.in_play = []
+        self._discard_pile.extend(self._in_play)
+        self._in_play.clear()
 
         self.draw(5)
         self.gold = 0
         self.actions = 1
+        self.buys = 1
 
     def discard(self, card):
         # if card not in self.hand:
-        self.hand.remove(card)
-        self.discard_pile.append(card)
+        self._hand.remove(card)
+        self._discard_pile.append(card)
 
     def draw(self, card_count=5):
-        self.hand.extend(self.reveal(card_count))
+        deck = self._deck.ids
+
+        if card_count <= 0:
+            # deck[-0:] is the whole deck, not none of it
+            return
+        elif card_count <= len(deck):
+            # Enough cards without a reshuffle: move the ids straight over
+            self._hand.ids.extend(deck[:-card_count - 1:-1])
+            del deck[-card_count:]
+        else:
+            self._hand.extend(self.reveal(card_count))
 
     def play(self, card):
-        if card not in self.hand:
+        if card not in self._hand:
             raise CardNotInHand('{0} is not in your current hand'.format(
                 card))
 
-        self.hand.remove(card)
-        self.in_play.append(card)
+        self._hand.remove(card)
+        self._in_play.append(card)
 
     def reveal(self, card_count=1):
         revealed = []
 
-        if card_count > len(self.deck):
-            revealed = list(self.deck)
-            card_count -= len(self.deck)
-            random.shuffle(self.discard_pile)
+        if card_count > len(self._deck):
+            revealed = list(self._deck)
+            card_count -= len(self._deck)
+            self.rng.shuffle(self._discard_pile.ids)
 
             # Shuffle and make the discard pile the new deck
-            self.deck, self.discard_pile = deque(self.discard_pile), []
+            self._deck, self._discard_pile = self._discard_pile, self._deck
+            self._discard_pile.clear()
 
-        try:
-            for i in xrange(card_count):
-                revealed.append(self.deck.pop())
-        except IndexError:
-            # If there's nothing left, there's nothing left
-            pass
+        deck = self._deck.ids
+        # If there's nothing left, there's nothing left
+        card_count = min(card_count, len(deck))
+        if card_count:
+            revealed.extend(CARD_NAMES[i] for i in deck[:-card_count - 1:-1])
+            del deck[-card_count:]
 
         return revealed
 
     def place_on_top(self, card):
-        if card not in self.hand:
+        if card not in self._hand:
             raise CardNotInHand('{0} is not in your current hand'.format(card))
 
-        self.hand.remove(card)
-        self.deck.append(card)
+        self._hand.remove(card)
+        self._deck.append(card)
 
     def trash(self, card, source='hand'):
         if source == 'hand':
-            self.hand.remove(card)
+            self._hand.remove(card)
         else:
             assert source == 'play'
-            self.in_play.remove(card)
+            self._in_play.remove(card)
+
+    def fork(self, rng):
+        '''
+        An independent copy of this player that shuffles with *rng*.
+        '''
+        player = Player.__new__(Player)
+        player.rng = rng
+        player._hand = self._hand.copy()
+        player._deck = self._deck.copy()
+        player._in_play = self._in_play.copy()
+        player._discard_pile = self._discard_pile.copy()
+        player.gold = self.gold
+        player.actions = self.actions
+        player.buys = self.buys
+
+        return player
+
+    def count(self, card):
+        '''
+        How many copies of *card* the player owns, across every zone.
+        '''
+        return sum(zone.count(card) for zone in (
+            self._deck, self._hand, self._in_play, self._discard_pile))
+
+    def counts(self):
+        '''
+        A vector of how many of each card the player owns, indexed by
+        interned card id.
+        '''
+        counts = [0] * len(CARD_NAMES)
+        for zone in (self._deck, self._hand, self._in_play,
+                     self._discard_pile):
+            for i in zone.ids:
+                counts[i] += 1
+
+        return counts
 
     @property
     def cards(self):
-        for card in (list(self.deck) + self.hand + self.in_play +
-                     self.discard_pile):
-            yield card
+        for zone in (self._deck, self._hand, self._in_play,
+                     self._discard_pile):
+            for card in zone:
+                yield card
 
     def __str__(self):
         s = ''
@@ -1,11 +1,325 @@
-import SocketServer
+'''
+A single-threaded TCP server hosting many games at once.
 
+Every connection is a non-blocking socket multiplexed with epoll (poll where
+epoll is missing), so idle connections cost a few KB and no thread.  The
+protocol is line based: clients send commands, the server answers each one
+with a JSON line and pushes a fresh "state" line to every player in a game
+whenever that game changes.
+
+    create <game-id> <player>[,<player>...] [<kingdom card> ...]
+    join <game-id> <player> seats this connection; one per player
+    leave
+    <anything else>         forwarded to Parser.eval for the joined game
+
+Run from the repository root:
+
+    python -m server.server [--host HOST] [--port PORT]
+'''
+import errno
+import json
+import select
+import socket
+
+from .game import Game
+from .parser import Parser
+from .simulator import BASE_SUPPLY
+
+RECV_SIZE = 1 << 14
+MAX_LINE = 1 << 12
+
+# Stop reading from a connection once this much output is waiting for it,
+# and resume (with one fresh state push) once it drains below LOW_WATER
+HIGH_WATER = 1 << 16
+LOW_WATER = 1 << 12
+
+READ = select.POLLIN
+WRITE = select.POLLOUT
+CLOSED = select.POLLHUP | select.POLLERR
+
+
+class _Poller(object):
+    # epoll where it exists, poll otherwise; timeouts are in seconds
+    def __init__(self):
+        if hasattr(select, 'epoll'):
+            self.poller = select.epoll()
+            self.scale = 1
+        else:
+            self.poller = select.poll()
+            self.scale = 1000
+
+    def register(self, fd, events):
+        self.poller.register(fd, events)
+
+    def modify(self, fd, events):
+        self.poller.modify(fd, events)
+
+    def unregister(self, fd):
+        self.poller.unregister(fd)
+
+    def poll(self, timeout):
+        return self.poller.poll(timeout * self.scale)
+
+
+class Table(object):
+    '''
+    A game, its parser and the connections seated at it.
+    '''
+    def __init__(self, game_id, game):
+        self.id = game_id
+        self.game = game
+        self.parser = Parser(game)
+        self.connections = set()
+
+    def state(self, player):
+        # What *player* is allowed to see of the game
+        game = self.game
+        seat = game.players[player]
+        state = {
+            'game': self.id,
+            'you': player,
+            'turn': game.player_name,
+            'phase': game.phase,
+            'wait': list(game.wait) if game.wait else None,
+            'supply': game.supply,
+            'hand': list(seat.hand),
+            'gold': seat.gold,
+            'actions': seat.actions,
+            'buys': seat.buys,
+            'over': game.is_over(),
+        }
+
+        if state['over']:
+            state['scores'] = game.scores()
+
+        return state
+
+
+class Connection(object):
+    def __init__(self, server, sock):
+        self.server = server
+        self.sock = sock
+        self.fd = sock.fileno()
+        self.inbuf = ''
+        self.outbuf = bytearray()
+        self.events = READ
+        self.table = None
+        self.player = None
+        # A state push was skipped while the client was behind
+        self.stale = False
+
+    def send(self, message):
+        self.outbuf += json.dumps(message, separators=(',', ':')) + '\n'
+        self._update()
+
+    def notify(self):
+        if len(self.outbuf) >= HIGH_WATER:
+            self.stale = True
+        else:
+            self.stale = False
+            self.send({'state': self.table.state(self.player)})
+
+    def handle_read(self):
+        try:
+            data = self.sock.recv(RECV_SIZE)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            return self.close()
+
+        if not data:
+            return self.close()
+
+        lines = (self.inbuf + data).split('\n')
+        self.inbuf = lines.pop()
+
+        if len(self.inbuf) > MAX_LINE:
+            self.send({'error': 'Line too long'})
+            return self.close()
+
+        for line in lines:
+            line = line.strip()
+            if line:
+                self.server.handle_line(self, line)
+
+            if self.sock is None:
+                break
+
+    def handle_write(self):
+        try:
+            sent = self.sock.send(self.outbuf)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return
+            return self.close()
+
+        del self.outbuf[:sent]
+
+        if self.stale and len(self.outbuf) < LOW_WATER:
+            self.notify()
+        else:
+            self._update()
+
+    def _update(self):
+        # Only ask for reads while the client keeps up with our output
+        if self.sock is None:
+            return
+
+        events = 0
+        if len(self.outbuf) < HIGH_WATER:
+            events |= READ
+        if self.outbuf:
+            events |= WRITE
+
+        if events != self.events:
+            self.events = events
+            self.server.poller.modify(self.fd, events)
+
+    def close(self):
+        if self.sock is None:
+            return
+
+        self.server.remove(self)
+        self.sock.close()
+        self.sock = None
+
+
+class DominionServer(object):
+    def __init__(self, address=('127.0.0.1', 1280), backlog=1024):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(address)
+        self.listener.listen(backlog)
+        self.listener.setblocking(0)
+        self.address = self.listener.getsockname()
+
+        self.poller = _Poller()
+        self.poller.register(self.listener.fileno(), READ)
+        self.connections = {}
+        self.tables = {}
+
+    def serve_forever(self, timeout=1.0):
+        while True:
+            self.poll(timeout)
+
+    def poll(self, timeout=0):
+        '''
+        Handles whatever socket events are ready within *timeout* seconds.
+        '''
+        listener = self.listener.fileno()
+
+        for fd, events in self.poller.poll(timeout):
+            if fd == listener:
+                self._accept()
+                continue
+
+            connection = self.connections.get(fd)
+            if connection is None:
+                continue
+
+            if events & READ:
+                connection.handle_read()
+            if events & WRITE and connection.sock is not None:
+                connection.handle_write()
+            if events & CLOSED and not events & READ:
+                connection.close()
+
+    def _accept(self):
+        # Take every pending connection, not just one per wakeup
+        while True:
+            try:
+                sock, _ = self.listener.accept()
+            except socket.error as e:
+                if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+
+            sock.setblocking(0)
+            connection = Connection(self, sock)
+            self.connections[connection.fd] = connection
+            self.poller.register(connection.fd, READ)
+
+    def remove(self, connection):
+        self.leave(connection)
+        self.poller.unregister(connection.fd)
+        del self.connections[connection.fd]
+
+    def leave(self, connection):
+        table = connection.table
+        if table is None:
+            return
+
+        table.connections.discard(connection)
+        connection.table = connection.player = None
+
+        if not table.connections and table.game.is_over():
+            del self.tables[table.id]
+
+    def handle_line(self, connection, line):
+        commands = line.split()
+
+        try:
+            if commands[0] == 'create':
+                self.create(*commands[1:])
+            elif commands[0] == 'join':
+                self.join(connection, *commands[1:])
+                return
+            elif commands[0] == 'leave':
+                self.leave(connection)
+            elif connection.table is None:
+                raise ValueError('Join a game first')
+            else:
+                table = connection.table
+                table.parser.eval(connection.player, line)
+                connection.send({'ok': True})
+                self.broadcast(table)
+                return
+        except Exception as e:
+            # Game rules raise plain Exceptions, so anything is a bad move
+            connection.send({'error': str(e) or type(e).__name__})
+            return
+
+        connection.send({'ok': True})
+
+    def create(self, game_id, players, *kingdom):
+        if game_id in self.tables:
+            raise ValueError('Game {0} already exists'.format(game_id))
+
+        supply = BASE_SUPPLY + [card for card in kingdom
+                                if card not in BASE_SUPPLY]
+        self.tables[game_id] = Table(
+            game_id, Game(players.split(','), supply))
+
+    def join(self, connection, game_id, player):
+        table = self.tables.get(game_id)
+        if table is None:
+            raise ValueError('There is no game {0}'.format(game_id))
+        if player not in table.game.players:
+            raise ValueError('{0} is not playing {1}'.format(player, game_id))
+        if any(seated.player == player and seated is not connection
+               for seated in table.connections):
+            raise ValueError('{0} is already seated in {1}'.format(
+                player, game_id))
+
+        self.leave(connection)
+        connection.table = table
+        connection.player = player
+        table.connections.add(connection)
+
+        connection.send({'ok': True})
+        connection.notify()
+
+    def broadcast(self, table):
+        for connection in table.connections:
+            connection.notify()
 
-class DominionServer(SocketServer.StreamRequestHandler):
-    def handle(self):
-        self.command = self.rfile.readline().strip()
-        print command
 
 if __name__ == '__main__':
-    server = SocketServer.TCPServer(('127.0.0.1', 1280), DominionServer)
-    server.serve_forever()
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Hosts Dominion games over TCP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1280)
+
+    args = parser.parse_args()
+    DominionServer((args.host, args.port)).serve_forever()
@@ -0,0 +1,289 @@
+'''
+Headless games between bots.
+
+Bots drive Game directly instead of going through Parser, so a game costs
+no string parsing.  Run from the repository root:
+
+    python -m server.simulator [--games N] [--seed S] [KINGDOM_CARD ...]
+'''
+from collections import Counter
+import random
+import time
+
+from . import cards
+from .game import Game
+
+BASE_SUPPLY = ['copper', 'silver', 'gold', 'estate', 'duchy', 'province']
+
+# Games that somehow stall are called off after this many rounds
+MAX_ROUNDS = 100
+
+
+class Bot(object):
+    '''
+    Plays no actions and buys nothing.  Subclasses override action and buy;
+    respond answers the prompts of interactive cards.
+    '''
+    def action(self, game, player):
+        '''
+        The name of the action card to play next, or None to stop.
+        '''
+        return None
+
+    def buy(self, game, player):
+        '''
+        The name of the card to buy next, or None to stop.
+        '''
+        return None
+
+    def respond(self, game, player, card):
+        '''
+        The command (as Parser would split it) answering *card*'s prompt.
+        '''
+        hand = game.players[player].hand
+
+        if card == 'bureaucrat':
+            for victory in hand:
+                if victory in cards.VICTORY_CARDS:
+                    return ['select', victory]
+            return ['reveal']
+        elif card == 'cellar':
+            return ['select']
+        elif card == 'chapel':
+            return ['select', 'None']
+        elif card == 'chancellor':
+            return ['no']
+        elif card == 'feast':
+            return ['select', 'duchy']
+
+        raise ValueError('{0} does not know how to answer {1}'.format(
+            type(self).__name__, card))
+
+
+class BigMoney(Bot):
+    '''
+    Buys Province at 8, Gold at 6 and Silver at 3, and never plays actions.
+    '''
+    def buy(self, game, player):
+        gold = player.gold
+        supply = game.supply
+
+        if gold >= 8 and supply.get('province'):
+            return 'province'
+        elif gold >= 6 and supply.get('gold'):
+            return 'gold'
+        elif gold >= 3 and supply.get('silver'):
+            return 'silver'
+
+        return None
+
+
+class BigMoneyWith(BigMoney):
+    '''
+    Big Money that also buys up to *copies* of one kingdom *card* whenever it
+    can afford it, and plays it whenever it is in hand.
+    '''
+    def __init__(self, card, copies=1):
+        self.card = card
+        self.copies = copies
+        self.cost = cards.lookup(card)._cost
+
+    def action(self, game, player):
+        if self.card in player.hand:
+            return self.card
+
+        return None
+
+    def buy(self, game, player):
+        gold = player.gold
+
+        if (gold >= self.cost and gold < 8 and game.supply.get(self.card) and
+                player.count(self.card) < self.copies):
+            return self.card
+
+        return super(BigMoneyWith, self).buy(game, player)
+
+
+class KingdomBot(BigMoney):
+    '''
+    Big Money that keeps one copy of each *kingdom* card, buying the
+    dearest it can afford whenever it has less than 8 to spend, and plays
+    every action it draws.
+    '''
+    def __init__(self, kingdom):
+        self.kingdom = sorted(kingdom,
+                              key=lambda card: -cards.lookup(card)._cost)
+
+    def action(self, game, player):
+        for card in player.hand:
+            if cards.lookup(card).flags & cards.ACTION:
+                return card
+
+        return None
+
+    def buy(self, game, player):
+        gold = player.gold
+
+        if gold < 8:
+            for card in self.kingdom:
+                if (cards.lookup(card)._cost <= gold and
+                        game.supply.get(card) and not player.count(card)):
+                    return card
+
+        return super(KingdomBot, self).buy(game, player)
+
+
+class GameResult(object):
+    def __init__(self, rounds, scores, winners, bought):
+        self.rounds = rounds
+        self.scores = scores
+        self.winners = winners
+        self.bought = bought
+
+
+class Simulator(object):
+    '''
+    Plays complete games of *kingdom* (server card names) between *bots*, a
+    {player name: Bot} dict whose order in *seats* is the turn order.
+    '''
+    def __init__(self, bots, kingdom=(), seats=None, rng=None):
+        if rng is None or isinstance(rng, (int, long)):
+            rng = random.Random(rng)
+
+        self.rng = rng
+        self.bots = bots
+        self.seats = list(seats or sorted(bots))
+        self.supply = BASE_SUPPLY + [card for card in kingdom
+                                     if card not in BASE_SUPPLY]
+
+    def play(self):
+        '''
+        Plays one game and returns its GameResult.
+        '''
+        return self.play_out(
+            Game(list(self.seats), list(self.supply), rng=self.rng))
+
+    def play_out(self, game):
+        '''
+        Plays *game* (fresh, or a Game.fork taken mid-game for a rollout) to
+        the end and returns its GameResult.
+        '''
+        bots = self.bots
+        bought = Counter()
+        seats = game.player_order
+
+        self._resolve(game)
+        while not game.is_over() and game.turn_index < MAX_ROUNDS * len(
+                seats):
+            name = game.player_name
+            player = game.player
+            bot = bots[name]
+
+            while player.actions > 0 and game.phase == 'Action':
+                card = bot.action(game, player)
+                if card is None:
+                    break
+
+                game.play(card)
+                self._resolve(game)
+
+            if game.phase != 'Buy':
+                game.play_treasures()
+
+            while player.buys > 0:
+                card = bot.buy(game, player)
+                if card is None:
+                    break
+
+                game.buy(card)
+                bought[card] += 1
+
+            game.next()
+
+        scores = game.scores()
+        best = max(scores.itervalues())
+        winners = [name for name in seats if scores[name] == best]
+        rounds = (game.turn_index + len(seats) - 1) // len(seats)
+
+        return GameResult(rounds, scores, winners, bought)
+
+    def _resolve(self, game):
+        # Answer interactive cards until nobody is waiting any more
+        while game.wait:
+            player, card = game.wait
+            game.respond(self.bots[player].respond(game, player, card),
+                         player)
+
+    def run(self, games):
+        '''
+        Plays *games* games and returns a Results summary.
+        '''
+        results = Results(self.seats)
+        start = time.time()
+
+        for _ in xrange(games):
+            results.add(self.play())
+
+        results.elapsed = time.time() - start
+        return results
+
+
+class Results(object):
+    '''
+    Aggregate statistics over many GameResults.
+    '''
+    def __init__(self, seats):
+        self.seats = seats
+        self.games = 0
+        self.rounds = 0
+        self.wins = Counter()
+        self.bought = Counter()
+        self.elapsed = 0.0
+
+    def add(self, result):
+        self.games += 1
+        self.rounds += result.rounds
+        self.bought.update(result.bought)
+
+        # Ties split the win
+        for name in result.winners:
+            self.wins[name] += 1.0 / len(result.winners)
+
+    @property
+    def mean_rounds(self):
+        return float(self.rounds) / self.games if self.games else 0.0
+
+    @property
+    def games_per_second(self):
+        return self.games / self.elapsed if self.elapsed else 0.0
+
+    def win_rate(self, name):
+        return self.wins[name] / self.games if self.games else 0.0
+
+
+def main(kingdom, games, seed):
+    simulator = Simulator(
+        {'big-money': BigMoney(), 'big-money-2': BigMoney()},
+        kingdom=kingdom, rng=seed)
+    results = simulator.run(games)
+
+    print '{0} games in {1:.2f}s ({2:.0f} games/s)'.format(
+        results.games, results.elapsed, results.games_per_second)
+    print 'Mean rounds: {0:.1f}'.format(results.mean_rounds)
+
+    for name in results.seats:
+        print '{0: <12} {1:.1%}'.format(name, results.win_rate(name))
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Plays Big Money bots against each '
+                            'other and reports games per second.')
+    parser.add_argument('kingdom', nargs='*', help='Kingdom cards to add to '
+                        'the supply.')
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=None)
+
+    args = parser.parse_args()
+    main(args.kingdom, args.games, args.seed)
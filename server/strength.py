@@ -0,0 +1,169 @@
+'''
+Estimates how a generated kingdom plays by simulating bot games on it.
+
+Every kingdom is reduced to the cards the server implements, and KingdomBots
+play *games* games on it across a pool of worker processes.  Results are
+cached under a canonical hash of the kingdom's card names (plus the
+simulation settings), so a kingdom is only ever simulated once.  Run from
+the repository root:
+
+    python -m server.strength [--kingdoms N] [--games N] [--workers N]
+'''
+from collections import namedtuple
+import hashlib
+import shelve
+
+from . import cards
+from .simulator import BASE_SUPPLY, KingdomBot, Simulator
+
+SUPPORTED_CARDS = frozenset(
+    name for name in cards.CARDS
+    if name not in cards.PLACEHOLDER_CARDS and name not in BASE_SUPPLY)
+
+Strength = namedtuple('Strength', [
+    'key', 'simulated', 'unsupported', 'games', 'mean_rounds',
+    'first_player_win_rate', 'win_rate_variance', 'buys'])
+
+
+def server_name(card):
+    # "Worker's Village" -> 'workers-village'
+    return card.name.lower().replace("'", '').replace(' ', '-')
+
+
+def canonical_hash(kingdom):
+    '''
+    The same hex digest for any kingdom with the same cards, in any order.
+    '''
+    names = sorted(card.name for card in kingdom)
+    return hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()
+
+
+def simulate(key, supply, games, players, seed):
+    '''
+    Plays *games* games of the server cards *supply* and returns the Strength
+    statistics for them (less the unsupported cards).
+    '''
+    seats = ['player-{0}'.format(i + 1) for i in xrange(players)]
+    bots = dict((seat, KingdomBot(supply)) for seat in seats)
+
+    # The seed belongs to the kingdom, so results don't depend on which
+    # batch or worker a kingdom landed in
+    results = Simulator(bots, kingdom=supply, seats=seats,
+                        rng=seed ^ int(key[:16], 16)).run(games)
+
+    rates = [results.win_rate(seat) for seat in seats]
+    mean = sum(rates) / len(rates)
+
+    return Strength(
+        key, tuple(supply), (), results.games, results.mean_rounds,
+        rates[0], sum((rate - mean) ** 2 for rate in rates) / len(rates),
+        dict((card, float(count) / results.games)
+             for card, count in results.bought.iteritems()))
+
+
+def _simulate(args):
+    return simulate(*args)
+
+
+class StrengthEstimator(object):
+    '''
+    Scores kingdoms with *games* simulated games of *players* KingdomBots
+    each, spread over *workers* processes.  *cache* is a dict-like store of
+    earlier results or the path of a shelve file to keep them in.
+    '''
+    def __init__(self, games=100, players=2, workers=1, seed=0, cache=None):
+        self.games = games
+        self.players = players
+        self.workers = workers
+        self.seed = seed
+
+        if isinstance(cache, basestring):
+            cache = shelve.open(cache)
+        self.cache = {} if cache is None else cache
+
+    def close(self):
+        if hasattr(self.cache, 'close'):
+            self.cache.close()
+
+    def _cache_key(self, kingdom):
+        return '{0}:{1}x{2}:{3}'.format(canonical_hash(kingdom), self.games,
+                                        self.players, self.seed)
+
+    def estimate(self, kingdoms):
+        '''
+        Returns a Strength for each of *kingdoms*, in order, simulating only
+        those that aren't cached (and each distinct one only once).
+        '''
+        kingdoms = list(kingdoms)
+        keys = [self._cache_key(kingdom) for kingdom in kingdoms]
+        unsupported = {}
+        tasks = {}
+
+        for key, kingdom in zip(keys, kingdoms):
+            names = [server_name(card) for card in kingdom]
+            unsupported[key] = tuple(sorted(
+                name for name in names if name not in SUPPORTED_CARDS))
+
+            if key not in self.cache and key not in tasks:
+                supply = sorted(name for name in names
+                                if name in SUPPORTED_CARDS)
+                tasks[key] = (key, supply, self.games, self.players,
+                              self.seed)
+
+        for strength in self._run(tasks.values()):
+            self.cache[strength.key] = strength._replace(
+                unsupported=unsupported[strength.key])
+
+        return [self.cache[key] for key in keys]
+
+    def _run(self, tasks):
+        if self.workers <= 1 or len(tasks) <= 1:
+            return [simulate(*task) for task in tasks]
+
+        import multiprocessing
+
+        pool = multiprocessing.Pool(self.workers)
+        try:
+            results = pool.map(_simulate, tasks)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return results
+
+
+def main(kingdoms, games, workers, seed, cache):
+    from kingdom_builder import dominion
+
+    collection = dominion.Collection('kingdom_builder/dominion_cards.yml',
+                                     rng=seed)
+    estimator = StrengthEstimator(games=games, workers=workers, seed=seed,
+                                  cache=cache)
+
+    try:
+        generated = collection.create_kingdom(kingdoms=kingdoms)
+        for kingdom, strength in zip(generated,
+                                     estimator.estimate(generated)):
+            print ', '.join(sorted(card.name for card in kingdom))
+            print ('  {0:.1f} rounds, first player wins {1:.1%}, '
+                   'simulated {2}').format(
+                strength.mean_rounds, strength.first_player_win_rate,
+                ', '.join(strength.simulated) or 'no kingdom cards')
+    finally:
+        estimator.close()
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description='Simulates games on generated '
+                            'kingdoms to estimate how they play.')
+    parser.add_argument('--kingdoms', type=int, default=5)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('-w', '--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cache', help='Shelve file to keep results in.')
+
+    args = parser.parse_args()
+    main(args.kingdoms, args.games, args.workers, args.seed, args.cache)
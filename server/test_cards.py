@@ -22,6 +22,24 @@ class TestCards(unittest.TestCase):
         self.assertIn('estate', cards.card_aggregator('Victory'))
         self.assertEquals(len(cards.card_aggregator('poop')), 0)
 
+    def test_get(self):
+        self.assertIs(cards.get('copper'), cards.get('copper'))
+        self.assertIsNot(cards.get('chapel'), cards.get('chapel'))
+        self.assertIsNot(cards.get('chapel'), cards.lookup('chapel'))
+
+        with self.assertRaises(KeyError):
+            cards.get('poop')
+
+    def test_flags(self):
+        self.assertTrue(cards.lookup('gold').flags & cards.TREASURE)
+        self.assertFalse(cards.lookup('gold').flags & cards.ACTION)
+        self.assertEquals(cards.lookup('bureaucrat').flags,
+                          cards.ACTION | cards.ATTACK)
+        self.assertEquals(cards.type_flags(['Victory']), cards.VICTORY)
+
+        # Setting the flags leaves no stray loop variable behind
+        self.assertFalse(hasattr(cards, 'card'))
+
     def test_adventurer(self):
         self.game.player.hand[0] = 'adventurer'
         coppers_0 = sum(1 for card in self.game.player.hand
@@ -72,7 +90,7 @@ class TestCards(unittest.TestCase):
         self.p.eval('jacob', 'play cellar')
         self.p.eval('jacob', 'select copper copper copper copper')
 
-        self.assertListEqual(['duchy'] * 4, self.game.player.hand)
+        self.assertListEqual(['duchy'] * 4, list(self.game.player.hand))
         self.assertEqual(self.game.player.actions, 1)
 
         self.p.eval('jacob', 'done')
@@ -103,9 +121,9 @@ class TestCards(unittest.TestCase):
         self.p.eval('mrkill', 'play chapel')
         self.p.eval('mrkill', 'select estate estate estate')
 
-        self.assertListEqual(self.game.player.hand, ['estate'])
+        self.assertListEqual(list(self.game.player.hand), ['estate'])
         self.assertEquals(len(self.game.player.discard_pile), 0)
-        self.assertListEqual(self.game.player.deck, ['copper'] * 5)
+        self.assertListEqual(list(self.game.player.deck), ['copper'] * 5)
 
     def test_council_room(self):
         self.game.player.deck.extend(['duchy'] * 5)
@@ -1,6 +1,7 @@
 import unittest
 
 from .game import Game
+from .parser import Parser
 from .player import CardNotInHand
 
 
@@ -50,3 +51,127 @@ class TestGame(unittest.TestCase):
             self.game.play(card_name='gold')
 
         self.assertEquals(self.game.player.gold, 1)
+
+    def test_seeded(self):
+        players = ['mrkill', 'jacob', 'matt']
+        supply = ['estate', 'province', 'duchy', 'copper']
+
+        first = Game(players=players, cards_in_supply=supply, rng=5)
+        second = Game(players=players, cards_in_supply=supply, rng=5)
+
+        for _ in xrange(6):
+            for player in players:
+                self.assertEquals(first.players[player].hand,
+                                  second.players[player].hand)
+            first.next()
+            second.next()
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(players=['mrkill', 'jacob', 'matt'],
+                         cards_in_supply=['estate', 'province', 'copper',
+                                          'silver', 'bureaucrat'], rng=3)
+
+    def assertSameGame(self, first, second):
+        for attribute in ('player_order', 'turn_index', 'phase', 'wait',
+                          'supply', 'cards', 'trash'):
+            self.assertEquals(getattr(first, attribute),
+                              getattr(second, attribute))
+
+        for name in first.player_order:
+            for attribute in ('hand', 'deck', 'in_play', 'discard_pile',
+                              'gold', 'actions', 'buys'):
+                self.assertEquals(getattr(first.players[name], attribute),
+                                  getattr(second.players[name], attribute))
+
+    def test_round_trip(self):
+        self.game.play('copper')
+        self.game.player.gold = 2
+        self.game.buy('estate')
+        self.game.trash.append('copper')
+
+        restored = Game.restore(self.game.snapshot())
+        self.assertSameGame(self.game, restored)
+        self.assertIsNot(restored.players['mrkill'].hand,
+                         self.game.players['mrkill'].hand)
+
+        # The random state comes along, so both games shuffle alike
+        for _ in xrange(6):
+            self.game.next()
+            restored.next()
+        self.assertSameGame(self.game, restored)
+
+    def test_without_rng(self):
+        blob = self.game.snapshot(include_rng=False)
+        self.assertTrue(len(blob) < 200)
+
+        with self.assertRaises(ValueError):
+            Game.restore(blob)
+
+        self.assertSameGame(self.game, Game.restore(blob, rng=1))
+
+    def test_bad_blob(self):
+        with self.assertRaises(ValueError):
+            Game.restore('nope' + self.game.snapshot()[4:])
+
+        with self.assertRaises(ValueError):
+            Game.restore(self.game.snapshot(include_rng=False)[:-3], rng=1)
+
+    def test_pending_attack(self):
+        self.game.player.hand[0] = 'bureaucrat'
+        self.game.players['jacob'].hand[0] = 'estate'
+        self.game.players['matt'].hand = ['copper'] * 4 + ['estate']
+        parser = Parser(self.game)
+
+        parser.eval('mrkill', 'play bureaucrat')
+        parser.eval('jacob', 'select estate')
+
+        restored = Game.restore(self.game.snapshot())
+        self.assertEquals(restored.pending(), ('matt', 'bureaucrat'))
+
+        Parser(restored).eval('matt', 'select estate')
+        self.assertEquals(restored.pending(), None)
+        self.assertEquals(restored.players['matt'].deck[-1], 'estate')
+
+
+class TestFork(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(players=['mrkill', 'jacob'],
+                         cards_in_supply=['estate', 'province', 'copper',
+                                          'silver', 'bureaucrat'], rng=3)
+
+    def test_independent(self):
+        fork = self.game.fork(rng=1)
+
+        fork.play('copper')
+        fork.player.gold = 3
+        fork.buy('silver')
+        fork.next()
+
+        self.assertEquals(self.game.turn_index, 0)
+        self.assertEquals(len(self.game.player.hand), 5)
+        self.assertEquals(self.game.supply['silver'],
+                          fork.supply['silver'] + 1)
+        self.assertEquals(self.game.player.in_play, [])
+
+    def test_seeded(self):
+        first = self.game.fork(rng=5)
+        second = self.game.fork(rng=5)
+
+        for _ in xrange(4):
+            first.next()
+            second.next()
+            self.assertEquals(first.player.hand, second.player.hand)
+
+    def test_pending_attack(self):
+        self.game.player.hand[0] = 'bureaucrat'
+        self.game.players['jacob'].hand[0] = 'estate'
+        Parser(self.game).eval('mrkill', 'play bureaucrat')
+
+        fork = self.game.fork()
+        self.assertIsNot(fork.active_card, self.game.active_card)
+
+        Parser(fork).eval('jacob', 'select estate')
+        self.assertEquals(fork.pending(), None)
+        self.assertEquals(self.game.pending(), ('jacob', 'bureaucrat'))
@@ -1,7 +1,7 @@
 import unittest
 
 from .parser import Parser, InvalidPlayer, InvalidCommand
-from .game import Game
+from .game import Game, NotYourTurn
 from .player import CardNotInHand
 from .cards import InvalidActivity
 
@@ -49,3 +49,16 @@ class TestParser(unittest.TestCase):
 
         self.assertEquals(self.game.player.gold, 2)
 
+    def test_turn_order(self):
+        p = Parser(self.game)
+
+        with self.assertRaises(NotYourTurn):
+            p.eval('jacob', 'play copper')
+        with self.assertRaises(NotYourTurn):
+            p.eval('jacob', 'done')
+
+        self.assertEquals(self.game.player_name, 'mrkill')
+        self.assertEquals(len(self.game.players['jacob'].hand), 5)
+
+        p.eval('mrkill', 'done')
+        self.assertEquals(self.game.player_name, 'jacob')
@@ -1,6 +1,6 @@
 import unittest
 
-from .player import Player, CardNotInHand
+from .player import Player, CardNotInHand, Zone, card_ids
 
 
 class TestPlayer(unittest.TestCase):
@@ -21,6 +21,22 @@ class TestPlayer(unittest.TestCase):
 
         self.assertEquals(len(self.player.hand), 10)
 
+    def test_draw_nothing(self):
+        # del deck[-0:] would empty the whole deck
+        for card_count in (0, -1):
+            self.player.draw(card_count)
+
+            self.assertEquals(len(self.player.hand), 5)
+            self.assertEquals(len(self.player.deck), 5)
+
+    def test_seed(self):
+        cards = ['copper'] * 7 + ['estate'] * 3
+        first = Player(initial_cards=cards, rng=4)
+        second = Player(initial_cards=cards, rng=4)
+
+        self.assertEquals(first.hand, second.hand)
+        self.assertEquals(first.deck, second.deck)
+
     def test_hand(self):
         self.assertEquals(len(self.player.hand), 5)
 
@@ -56,3 +72,50 @@ class TestPlayer(unittest.TestCase):
 
         self.assertEquals(estates_0 - 1, estates_1)
         self.assertEquals(self.player.deck[-1], 'estate')
+
+    def test_count(self):
+        self.assertEquals(self.player.count('copper'), 7)
+        self.assertEquals(self.player.count('estate'), 3)
+        self.assertEquals(self.player.count('poop'), 0)
+
+        counts = self.player.counts()
+        self.assertEquals(sum(counts), 10)
+
+    def test_zone_assignment(self):
+        self.player.hand = ['gold', 'copper']
+
+        self.assertIsInstance(self.player.hand, Zone)
+        self.assertEquals(self.player.hand, ['gold', 'copper'])
+
+        self.player.play('gold')
+        self.assertEquals(self.player.in_play, ['gold'])
+
+
+class TestZone(unittest.TestCase):
+    def test_list_view(self):
+        zone = Zone(['copper', 'estate', 'copper'])
+
+        self.assertEquals(len(zone), 3)
+        self.assertEquals(list(zone), ['copper', 'estate', 'copper'])
+        self.assertEquals(zone[-1], 'copper')
+        self.assertEquals(zone[:2], ['copper', 'estate'])
+        self.assertIn('estate', zone)
+        self.assertNotIn('poop', zone)
+        self.assertEquals(zone.count('copper'), 2)
+
+        zone[0] = 'gold'
+        zone.remove('copper')
+        self.assertEquals(zone, ['gold', 'estate'])
+
+        with self.assertRaises(ValueError):
+            zone.remove('province')
+
+        self.assertEquals(zone.pop(), 'estate')
+        self.assertEquals(repr(zone), "['gold']")
+
+    def test_take(self):
+        zone = Zone(['copper', 'estate', 'silver', 'estate'])
+        taken = zone.take(card_ids(['copper', 'silver']))
+
+        self.assertEquals(len(taken), 2)
+        self.assertEquals(zone, ['estate', 'estate'])
@@ -0,0 +1,137 @@
+import json
+import socket
+import unittest
+
+from . import server
+from .server import DominionServer
+
+
+class Client(object):
+    def __init__(self, dominion):
+        self.dominion = dominion
+        self.sock = socket.create_connection(dominion.address)
+        self.sock.settimeout(0.01)
+        self.buffer = ''
+
+    def send(self, line):
+        self.sock.sendall(line + '\n')
+
+    def receive(self):
+        # Pump the server until a whole line has arrived
+        while '\n' not in self.buffer:
+            self.dominion.poll(0.01)
+            try:
+                self.buffer += self.sock.recv(4096)
+            except socket.timeout:
+                pass
+
+        line, self.buffer = self.buffer.split('\n', 1)
+        return json.loads(line)
+
+    def close(self):
+        self.sock.close()
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        self.dominion = DominionServer(('127.0.0.1', 0))
+        self.jacob = Client(self.dominion)
+        self.matt = Client(self.dominion)
+
+    def tearDown(self):
+        self.jacob.close()
+        self.matt.close()
+        self.dominion.listener.close()
+
+    def test_game(self):
+        self.jacob.send('create g1 jacob,matt cellar')
+        self.assertEquals(self.jacob.receive(), {'ok': True})
+
+        self.jacob.send('join g1 jacob')
+        self.assertEquals(self.jacob.receive(), {'ok': True})
+        state = self.jacob.receive()['state']
+        self.assertEquals(state['turn'], 'jacob')
+        self.assertEquals(len(state['hand']), 5)
+        self.assertEquals(state['supply']['cellar'], 10)
+
+        self.matt.send('join g1 matt')
+        self.matt.receive()
+        self.matt.receive()
+
+        # Every player sees the move
+        self.jacob.send('done')
+        self.assertEquals(self.jacob.receive(), {'ok': True})
+        self.assertEquals(self.jacob.receive()['state']['turn'], 'matt')
+        self.assertEquals(self.matt.receive()['state']['turn'], 'matt')
+
+    def test_errors(self):
+        self.jacob.send('play copper')
+        self.assertIn('error', self.jacob.receive())
+
+        self.jacob.send('join nope jacob')
+        self.assertIn('error', self.jacob.receive())
+
+        self.jacob.send('create g1 jacob,matt poop')
+        self.assertIn('error', self.jacob.receive())
+
+        self.jacob.send('create g1 jacob,matt')
+        self.jacob.receive()
+        self.jacob.send('create g1 jacob,matt')
+        self.assertIn('error', self.jacob.receive())
+
+        self.jacob.send('join g1 jacob')
+        self.jacob.receive()
+        self.jacob.receive()
+        self.jacob.send('play poop')
+        self.assertIn('error', self.jacob.receive())
+
+    def test_seats(self):
+        self.jacob.send('create g1 jacob,matt')
+        self.jacob.receive()
+        self.jacob.send('join g1 jacob')
+        self.jacob.receive()
+        self.jacob.receive()
+
+        # A seat belongs to one connection
+        self.matt.send('join g1 jacob')
+        self.assertIn('error', self.matt.receive())
+
+        # Only the player whose turn it is can play or end the turn
+        self.matt.send('join g1 matt')
+        self.matt.receive()
+        self.matt.receive()
+        self.matt.send('done')
+        self.assertIn('error', self.matt.receive())
+        self.matt.send('play copper')
+        self.assertIn('error', self.matt.receive())
+
+        # The seat frees up once its connection leaves
+        self.jacob.send('leave')
+        self.jacob.receive()
+        self.matt.send('join g1 jacob')
+        self.assertEquals(self.matt.receive(), {'ok': True})
+
+    def test_backpressure(self):
+        self.jacob.send('create g1 jacob,matt')
+        self.jacob.receive()
+        self.jacob.send('join g1 jacob')
+        self.jacob.receive()
+        self.jacob.receive()
+
+        connection, = [connection for connection in
+                       self.dominion.connections.itervalues()
+                       if connection.table]
+        connection.outbuf += 'x' * server.HIGH_WATER
+        connection._update()
+        self.assertFalse(connection.events & server.READ)
+
+        # Updates for a client that is behind are coalesced, not queued
+        size = len(connection.outbuf)
+        connection.notify()
+        self.assertEquals(len(connection.outbuf), size)
+        self.assertTrue(connection.stale)
+
+        del connection.outbuf[:]
+        connection.handle_write()
+        self.assertFalse(connection.stale)
+        self.assertTrue(connection.events & server.READ)
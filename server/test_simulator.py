@@ -0,0 +1,79 @@
+import unittest
+
+from .game import Game, NoRemainingBuys, NotEnoughGold, EmptySupply
+from .simulator import BigMoney, BigMoneyWith, Simulator, MAX_ROUNDS
+
+
+class TestBuy(unittest.TestCase):
+    def setUp(self):
+        self.game = Game(players=['jacob', 'matt'],
+                         cards_in_supply=['copper', 'silver', 'estate',
+                                          'province'], rng=1)
+
+    def test_buy(self):
+        player = self.game.player
+        player.gold = 3
+
+        self.game.buy('silver')
+        self.assertEquals(player.gold, 0)
+        self.assertEquals(player.buys, 0)
+        self.assertIn('silver', player.discard_pile)
+
+        with self.assertRaises(NoRemainingBuys):
+            self.game.buy('copper')
+
+    def test_errors(self):
+        self.game.player.gold = 2
+
+        with self.assertRaises(NotEnoughGold):
+            self.game.buy('silver')
+
+        self.game.supply['estate'] = 0
+        with self.assertRaises(EmptySupply):
+            self.game.buy('estate')
+
+    def test_scores(self):
+        self.assertEquals(self.game.scores(), {'jacob': 3, 'matt': 3})
+        self.assertFalse(self.game.is_over())
+
+        self.game.supply['province'] = 0
+        self.assertTrue(self.game.is_over())
+
+
+class TestSimulator(unittest.TestCase):
+    def test_play(self):
+        simulator = Simulator({'a': BigMoney(), 'b': BigMoney()}, rng=3)
+        result = simulator.play()
+
+        self.assertTrue(0 < result.rounds <= MAX_ROUNDS)
+        self.assertTrue(result.winners)
+        self.assertTrue(result.bought['province'] > 0)
+
+    def test_seeded(self):
+        def run(seed):
+            simulator = Simulator(
+                {'a': BigMoney(), 'b': BigMoneyWith('council-room')},
+                kingdom=['council-room'], rng=seed)
+            return [(result.rounds, result.scores)
+                    for result in (simulator.play() for _ in xrange(5))]
+
+        self.assertEquals(run(7), run(7))
+
+    def test_results(self):
+        simulator = Simulator({'a': BigMoney(), 'b': BigMoney()}, rng=11)
+        results = simulator.run(20)
+
+        self.assertEquals(results.games, 20)
+        self.assertTrue(results.mean_rounds > 0)
+        self.assertAlmostEqual(
+            results.win_rate('a') + results.win_rate('b'), 1.0)
+
+    def test_play_out(self):
+        simulator = Simulator({'a': BigMoney(), 'b': BigMoney()}, rng=5)
+        game = Game(['a', 'b'], list(simulator.supply), rng=5)
+        for _ in xrange(10):
+            game.next()
+
+        result = simulator.play_out(game.fork(rng=1))
+        self.assertTrue(result.winners)
+        self.assertEquals(game.turn_index, 10)
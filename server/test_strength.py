@@ -0,0 +1,62 @@
+from collections import namedtuple
+import unittest
+
+from . import strength
+
+Card = namedtuple('Card', 'name')
+
+KINGDOM = [Card(name) for name in (
+    'Chapel', 'Council Room', "Worker's Village", 'Smithy')]
+
+
+class TestStrength(unittest.TestCase):
+    def test_names(self):
+        self.assertEquals([strength.server_name(card) for card in KINGDOM],
+                          ['chapel', 'council-room', 'workers-village',
+                           'smithy'])
+
+        self.assertEquals(strength.canonical_hash(KINGDOM),
+                          strength.canonical_hash(KINGDOM[::-1]))
+        self.assertNotEqual(strength.canonical_hash(KINGDOM),
+                            strength.canonical_hash(KINGDOM[1:]))
+
+    def test_estimate(self):
+        estimator = strength.StrengthEstimator(games=10, seed=1)
+        result, = estimator.estimate([KINGDOM])
+
+        self.assertEquals(result.simulated, ('chapel', 'council-room'))
+        self.assertEquals(result.unsupported, ('smithy', 'workers-village'))
+        self.assertEquals(result.games, 10)
+        self.assertTrue(result.mean_rounds > 0)
+        self.assertTrue(0 <= result.first_player_win_rate <= 1)
+        self.assertIn('province', result.buys)
+
+    def test_cache(self):
+        simulated = []
+        original = strength.simulate
+
+        def counting(*args):
+            simulated.append(args[0])
+            return original(*args)
+
+        strength.simulate = counting
+        try:
+            estimator = strength.StrengthEstimator(games=5, seed=1)
+            first = estimator.estimate([KINGDOM, KINGDOM[::-1]])
+            second = estimator.estimate([KINGDOM[1:], KINGDOM])
+        finally:
+            strength.simulate = original
+
+        # One run per distinct kingdom, however often it turns up
+        self.assertEquals(len(simulated), 2)
+        self.assertEquals(first[0], first[1])
+        self.assertEquals(second[1], first[0])
+
+    def test_seeded(self):
+        # A kingdom's result doesn't depend on what it was batched with
+        alone, = strength.StrengthEstimator(games=5, seed=3).estimate(
+            [KINGDOM])
+        batched = strength.StrengthEstimator(games=5, seed=3).estimate(
+            [KINGDOM[:2], KINGDOM])
+
+        self.assertEquals(alone, batched[1])